@@ -3,11 +3,18 @@
 """ Utility function to split a year run to monthly runs. This is DSO+T specific helper functions
 """
 
+import copy
 import json
 import sys
 
 import prepare_case_dsot_f as prep_case
 
+# (StartTime, EndTime) month-day windows for each monthly run, indexed by month 0-11;
+# each run starts a couple of days early so the agents can settle before the month
+MONTH_WINDOWS = [("01-01 00:00:00", "02-01 00:00:00")] + \
+                [(f"{i:02}-29 00:00:00", f"{i + 2:02}-01 00:00:00") for i in range(1, 11)] + \
+                [("11-29 00:00:00", "12-30 00:00:00")]
+
 
 def generate_case(case_name, port, pv=None, bt=None, fl=None, ev=None):
 
@@ -24,25 +31,12 @@ def generate_case(case_name, port, pv=None, bt=None, fl=None, ev=None):
                 ppc['caseName'] = node + "_" + directory_name
                 ppc['port'] = int(port + i)
 
-                year = case_start_year
-                month = '{0:0>2}'.format(i)
-                daytime = "-29 00:00:00"
-                if i == 0:
-                    daytime = "-01 00:00:00"
-                    month = '01'
-                ppc['StartTime'] = str(year) + "-" + month + daytime
-
-                year = case_start_year
-                month = '{0:0>2}'.format(i+2)
-                daytime = "-01 00:00:00"
-                if i == 11:
-                    daytime = "-30 00:00:00"
-                    month = '12'
-                ppc['EndTime'] = str(year) + "-" + month + daytime
+                start, end = MONTH_WINDOWS[i]
+                ppc['StartTime'] = f"{case_start_year}-{start}"
+                ppc['EndTime'] = f"{case_start_year}-{end}"
 
-                with open("generate_case_config.json", 'w') as out_file:
-                    json.dump(ppc, out_file, indent=2)
-                prep_case.prepare_case(int(node), "generate_case_config", pv=pv, bt=bt, fl=fl, ev=ev)
+                # prepare_case edits the config it is given and writes its own copy into the case folder
+                prep_case.prepare_case(int(node), copy.deepcopy(ppc), pv=pv, bt=bt, fl=fl, ev=ev)
 
             if case_start_year == case_end_year:
                 break
@@ -39,9 +39,12 @@ else:
 # Simulation settings for the experimental case
 def prepare_case(node, mastercase, pv=None, bt=None, fl=None, ev=None):
 
-    # We need to load in the master metadata (*system_case_config.json)
-    with open(mastercase + '.json', 'r', encoding='utf-8') as json_file:
-        sys_config = json.load(json_file)
+    # We need to load in the master metadata (*system_case_config.json), unless it was handed in already loaded
+    if isinstance(mastercase, dict):
+        sys_config = mastercase
+    else:
+        with open(mastercase + '.json', 'r', encoding='utf-8') as json_file:
+            sys_config = json.load(json_file)
 
     # Get path for other data
     data_path = sys_config['dataPath']
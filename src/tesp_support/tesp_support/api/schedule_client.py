@@ -8,16 +8,82 @@ co-simulations with many entities reading in identical data files; see
 file docstring of "schedule_server.py" for further details. This class is 
 intended to be instantiated in every software entity that needs to access the
 data provided by the schedule server.
+
+With shared=True, and a server started with "shared_memory" set in its
+config, the minute schedules and PV forecasts are read straight out of the
+server's shared memory on the same host, and only the TOU lookups go through
+the server. When the blocks cannot be attached (another host, or a server that
+does not share them) the client uses the proxy as usual.
 """
 
+import logging as log
+import sys
 
+import numpy as np
+from multiprocessing import resource_tracker
 from multiprocessing.managers import BaseManager
+from multiprocessing.shared_memory import SharedMemory
 import psutil  # 3rd party module for process info (not strictly required)
 
+from .schedule_server import hourly_means, pv_window
+
+
+# Stands in for the server proxy, answering the forecasts locally from shared memory
+class SharedDataProxy(object):
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.shm = []
+        self.csum = {}
+        self.arr = {}
+        self.t0 = {}
+        shared = proxy.shared_schedules()
+        if not any(shared.values()):
+            raise FileNotFoundError('the schedule server has no schedules in shared memory')
+        try:
+            for kind, arrays in (('csum', self.csum), ('arr', self.arr)):
+                for name, (shm_name, shape, dtype, t0) in shared[kind].items():
+                    shm = self._attach(shm_name)
+                    self.shm.append(shm)
+                    arrays[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+                    arrays[name].flags.writeable = False
+                    self.t0[name] = t0
+        except Exception:
+            self.close()
+            raise
+
+    @staticmethod
+    def _attach(shm_name):
+        # The server owns the blocks; a client must not unlink them when it exits
+        if sys.version_info >= (3, 13):
+            return SharedMemory(name=shm_name, track=False)
+        # before 3.13 attaching registers the block with this process's resource
+        # tracker, which would unlink it when the client exits
+        shm = SharedMemory(name=shm_name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+    def close(self):
+        """ Releases the views and detaches from the shared memory blocks
+        """
+        self.csum.clear()
+        self.arr.clear()
+        for shm in self.shm:
+            shm.close()
+        self.shm.clear()
+
+    def forecasting_schedules(self, name, time, len_forecast):
+        return hourly_means(self.csum[name], self.t0[name], time, len_forecast)
+
+    def forecasting_pv_schedules(self, name, time, window_length, col_num):
+        return pv_window(self.arr[name], self.t0[name], time, window_length, col_num).tolist()
+
+    def read_tou_schedules(self, name, time, col_num):
+        return self.proxy.read_tou_schedules(name, time, col_num)
+
 
 # Grab the shared proxy class.  All methods in that class will be available here
 class DataClient(object):
-    def __init__(self, port):
+    def __init__(self, port, shared=False):
         # assert self._checkForProcess('DataServer.py'), 'Must have DataServer running'
 
         class myManager(BaseManager):
@@ -27,6 +93,11 @@ class DataClient(object):
         self.mgr = myManager(address=('localhost', port), authkey=b'DataProxy01')
         self.mgr.connect()
         self.proxy = self.mgr.DataProxy()
+        if shared:
+            try:
+                self.proxy = SharedDataProxy(self.proxy)
+            except OSError as ex:
+                log.warning('Schedule shared memory not available, using the server proxy: %s', ex)
 
     # Verify the server is running (not required)
     @staticmethod
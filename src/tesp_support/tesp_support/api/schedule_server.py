@@ -11,20 +11,35 @@ in memory lead to an untenably large memory footprint. To solve this problem,
 this simple server was implemented; it reads in the data from disk once and
 provides two simple APIs for other entities to extract the data.
 
-
-
+With "shared_memory" set to true in the server config, the minute schedule
+running sums and the PV forecasts are also placed in shared memory, so
+clients on the same host can read them directly without a round trip to the
+server for every forecast; see DataClient in "schedule_client.py". The blocks
+are unlinked when the server stops; if it is killed outright, the
+multiprocessing resource tracker that registered them unlinks them instead.
 """
 
+import functools
 import json
+import signal
+import sys
 import numpy as np
 import pandas as pd
+from multiprocessing import Pool
 from multiprocessing.managers import SyncManager
+from multiprocessing.shared_memory import SharedMemory
 
 from .data import arguments
 
 # Global for storing the data to be served
 sch_df_dict = {}
-cache_output = {}
+sch_t0_dict = {}
+sch_csum_dict = {}
+sch_arr_dict = {}
+sch_shm_dict = {}
+sch_tou_dict = {}
+# arrays placed in shared memory by share_schedules, by kind
+shared_arrays = {'csum': sch_csum_dict, 'arr': sch_arr_dict}
 
 #
 # power_sch = ["pv_power", "../solar/auto_run/solar_pv_power_profiles/8-node_dist_hourly_forecast_power.csv"]
@@ -48,6 +63,166 @@ cache_output = {}
 # copy_sch = ['constant','responsive_loads']
 
 
+def load_schedule(sch_path):
+    """ Reads a schedule file into a data frame indexed by time, along with what the forecasts need from it
+
+    The running sum is built in the same worker while the values are still
+    at hand, so the main process only has to collect the results.
+
+    Args:
+        sch_path (tuple): schedule name and path of its .csv file
+    Returns:
+        tuple: schedule name, data frame, time of the first value and running sum
+    """
+    sch, path = sch_path
+    df = pd.read_csv(path, index_col=0, parse_dates=True)
+    return sch, df, df.index[0], running_sum(df['data'])
+
+
+def running_sum(data):
+    """ Returns the running sum of a schedule, with a leading zero
+
+    The sum of any run of values from i to j-1 is then csum[j] - csum[i], so
+    the hourly means of a minute schedule can be read off directly for any
+    starting minute without averaging the values again on every request.
+
+    Args:
+        data (pd.Series): schedule values, one per minute
+    """
+    return np.concatenate(([0.0], np.cumsum(data.to_numpy(dtype=np.float64))))
+
+
+def pv_window(arr, t0, time, window_length, col_num):
+    """ Returns window length values of the given time out of an hourly forecast table
+
+    Args:
+        arr (np.ndarray): forecast values, one row per hour and one column per entity
+        t0 (pd.Timestamp): time of the first row
+        time (any): current time
+        window_length (int): length of window
+        col_num (int): column number 1 to n
+    Raises:
+        KeyError: if the window does not start on an hour of the table or runs past its end
+    """
+    # the forecast files are hourly, so the window start is a row offset from the first entry
+    offset, rest = divmod(pd.Timestamp(time) - t0, pd.Timedelta(hours=1))
+    if rest or offset < 0 or offset + window_length > len(arr):
+        raise KeyError('PV forecast window of %d hours from %s is not in the table' % (window_length, time))
+    return arr[offset:offset + window_length, col_num - 1]
+
+
+# Forecast windows are memoized on the full request rather than kept in one
+# [time, value] slot per schedule, since agents with different skews ask
+# for the same schedule at different times and would evict each other.
+# The schedules never change once the server is up, so entries never expire.
+@functools.lru_cache(maxsize=4096)
+def pv_forecast(name, time, window_length, col_num):
+    """ Returns window length values of the given time for the name of schedule forecast and column
+
+    Args:
+        name (str): schedule name for data frame
+        time (any): current time
+        window_length (int): length of window
+        col_num (int): column number 1 to n
+    Returns:
+        tuple: window_length values as plain floats; a tuple so that the cached
+        window cannot be changed by a caller
+    """
+    return tuple(pv_window(sch_arr_dict[name], sch_t0_dict[name], time, window_length, col_num).tolist())
+
+
+# Agents ask for several schedules at the same time, so the conversion of a time
+# to a schedule offset is memoized by value (the proxy hands every call a new object)
+@functools.lru_cache(maxsize=1024)
+def minute_offset(time, t0):
+    """ Returns the minute offset of the given time into a minute schedule
+
+    Args:
+        time (any): time of interest, any year
+        t0 (pd.Timestamp): time of the first schedule value
+    """
+    # Make sure that the year of time is the same as the schedule and ignore seconds
+    return int((time.replace(year=t0.year, second=0) - t0).total_seconds()) // 60
+
+
+def hourly_means(csum, t0, time, len_forecast):
+    """ Returns len_forecast hourly means from the given time out of a schedule running sum
+
+    Args:
+        csum (np.ndarray): running sum of the schedule, see running_sum
+        t0 (pd.Timestamp): time of the first schedule value
+        time (any): current time at which DA optimization occurs
+        len_forecast (int): length of forecast in hours
+    """
+    n = len(csum) - 1
+    start = minute_offset(time, t0)
+    stop = start + len_forecast * 60
+    # the running sums at every 60th minute bound the hours, so each hourly mean is a difference
+    if stop > n:  # the window goes into the next year, use the same year values instead
+        # first hour bound past the end of the year, counted from the start of the year
+        first = (start - n - 1) % 60 + 1
+        bounds = np.concatenate((csum[start::60], csum[n] + csum[first:stop - n + 1:60]))
+    else:  # if the window lies in the same year
+        bounds = csum[start:stop + 1:60]
+    means = np.diff(bounds)
+    means /= 60
+    return means
+
+
+@functools.lru_cache(maxsize=4096)
+def hourly_forecast(name, time, len_forecast):
+    """ Returns len_forecast hourly means from the given time for the name schedule
+
+    Args:
+        name (str): schedule name for data frame used to forecast
+        time (any): current time at which DA optimization occurs
+        len_forecast (int): length of forecast in hours
+    """
+    means = hourly_means(sch_csum_dict[name], sch_t0_dict[name], time, len_forecast)
+    # shared by every caller that hits the cache, so guard it against in-place edits
+    means.flags.writeable = False
+    return means
+
+
+def share_array(key, arr):
+    """ Copies an array into a new shared memory block and returns a view of the block
+
+    Args:
+        key (tuple): kind of array and schedule name, used to find the block again
+        arr (np.ndarray): array to copy
+    """
+    shm = SharedMemory(create=True, size=arr.nbytes)
+    view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+    view[:] = arr
+    view.flags.writeable = arr.flags.writeable
+    sch_shm_dict[key] = shm
+    return view
+
+
+def share_schedules():
+    """ Moves the schedule running sums and the PV forecast tables into shared memory blocks
+
+    The arrays in sch_csum_dict and sch_arr_dict are replaced by views of the
+    shared blocks, so the data is not held twice. Clients on the same host can
+    map the blocks (see shared_schedules) and compute forecasts in their own
+    process instead of making a proxy call for every forecast.
+    """
+    for kind, arrays in shared_arrays.items():
+        for sch, arr in arrays.items():
+            arrays[sch] = share_array((kind, sch), arr)
+
+
+def release_schedules():
+    """ Frees the shared memory blocks created by share_schedules
+    """
+    for (kind, sch), shm in sch_shm_dict.items():
+        # the block cannot be closed while a view of it is still held
+        shared_arrays[kind][sch] = shared_arrays[kind][sch].copy()
+        shm.close()
+        shm.unlink()
+    sch_shm_dict.clear()
+
+
 # Proxy class to be shared with different processes
 # Don't put big data in here since that will force it to be piped to the
 # other process when instantiated there, instead just return a portion of
@@ -65,19 +240,10 @@ class DataProxy(object):
             time (any): current time
             window_length (int): length of window
             col_num (int): column number 1 to n
+        Returns:
+            list: window_length values as plain floats
         """
-        idx = name + str(col_num)
-        try:
-            cache = cache_output[idx]
-        except:
-            cache_output[idx] = [0, 0]
-            cache = cache_output[idx]
-
-        if cache[0] != time:
-            cache[0] = time
-            cache[1] = sch_df_dict[name].loc[pd.date_range(time, periods=window_length, freq='H')]
-        # print(name, " ", time)
-        return cache[1][col_num]
+        return list(pv_forecast(name, time, window_length, col_num))
 
     @staticmethod
     def forecasting_schedules(name, time, len_forecast):
@@ -88,26 +254,23 @@ class DataProxy(object):
             time (any): current time at which DA optimization occurs
             len_forecast (int): length of forecast in hours
         """
-        cache = cache_output[name]
-        if cache[0] != time:
-            dataframe = sch_df_dict[name]
-            # First let's make sure that the year of time_begin is same as data frame and ignore seconds
-            time_begin = time.replace(year=dataframe.index[0].year, second=0)
-            time_stop = time_begin + pd.Timedelta(hours=len_forecast)
-            # Now let's check if time_stop has gone to the next year
-            if time_stop.year > time_begin.year:  # instead of next year, use the same year values
-                temp = pd.concat([dataframe[time_begin:],
-                                  dataframe[:time_stop.replace(year=dataframe.index[0].year)]])['data'].values
-            elif time_stop.year == time_begin.year:  # if the window lies in the same year
-                temp = dataframe[time_begin:time_stop]['data'].values
-            else:
-                raise UserWarning("Something is wrong with dates in forecasting_schedules function!!")
-            cache[0] = time
-            cache[1] = np.mean(temp[0:-1].reshape(-1, 60), axis=1)
-            # print(name, " ", time)
-        return cache[1]
-    
-    
+        return hourly_forecast(name, time, len_forecast)
+
+    @staticmethod
+    def shared_schedules():
+        """ Returns where the schedule arrays live in shared memory
+
+        Returns:
+            dict: for each kind of array ('csum' for the minute schedule running sums,
+            'arr' for the PV forecast tables), schedule name to
+            (shared memory name, shape, dtype, time of the first value)
+        """
+        shared = {kind: {} for kind in shared_arrays}
+        for (kind, sch), shm in sch_shm_dict.items():
+            arr = shared_arrays[kind][sch]
+            shared[kind][sch] = (shm.name, arr.shape, arr.dtype.str, sch_t0_dict[sch])
+        return shared
+
     @staticmethod
     def read_tou_schedules(name, time, col_num):
         """ Returns tou price values of the given time for the name of schedule forecast and column
@@ -115,18 +278,21 @@ class DataProxy(object):
         Args:
             name (str): schedule name for data frame
             time (any): current time
-            col_num (int): column number 1 to n
+            col_num (int): column number 0 to n-1
+        Raises:
+            KeyError: if the schedule has no price at exactly that time, as for a
+            lookup by label; a tz-aware time never matches the naive schedule times
         """
-        idx = name + str(col_num)
-        try:
-            cache = cache_output[idx]
-        except:
-            cache_output[idx] = [0, 0]
-            cache = cache_output[idx]
-        if cache[0] != time:
-            cache[0] = time
-            cache[1] = sch_df_dict[name].loc[pd.to_datetime(time)]
-        return cache[1][col_num]
+        ts = pd.Timestamp(time)
+        if ts.tzinfo is not None:
+            # .value is UTC, so it would be compared against the wrong local times
+            raise KeyError('%s has naive times, not the tz-aware %s' % (name, time))
+        idx, mat = sch_tou_dict[name]
+        # the row at the time, found by bisecting the nanosecond timestamps
+        pos = np.searchsorted(idx, ts.value)
+        if pos == len(idx) or idx[pos] != ts.value:
+            raise KeyError('%s has no price at %s' % (name, time))
+        return float(mat[pos, col_num])
 
 
 def schedule_server(config_file, port):
@@ -143,32 +309,43 @@ def schedule_server(config_file, port):
     tou_sch = ppc["tou_sch"]
     # port = ppc["port"]
 
-    # load data frames schedules
-    for sch in appliance_sch + wh_sch + comm_sch:
-        sch_df_dict[sch] = pd.read_csv(schedule_dir + sch + '.csv', index_col=0)
-        sch_df_dict[sch].index = pd.to_datetime(sch_df_dict[sch].index)
-        cache_output[sch] = [0, 0]
+    # load data frames schedules, parsing the files in parallel
+    paths = [(sch, schedule_dir + sch + '.csv') for sch in appliance_sch + wh_sch + comm_sch]
+    with Pool() as pool:
+        for sch, df, t0, csum in pool.imap_unordered(load_schedule, paths):
+            sch_df_dict[sch] = df
+            sch_t0_dict[sch] = t0
+            sch_csum_dict[sch] = csum
 
-    # create a data frame for constant schedule with all entries as 1.0. Copy it from any other data frame
+    # create a data frame for constant schedule with all entries as 1.0. Reuse the index of any other data frame
     for cpy in copy_sch:
         sch = cpy[0]
-        sch_df_dict[sch] = sch_df_dict[cpy[1]].copy(deep=True)
-        sch_df_dict[sch]['data'] = 1.0
-        cache_output[sch] = [0, 0]
+        src = sch_df_dict[cpy[1]]
+        sch_df_dict[sch] = pd.DataFrame({'data': np.ones(len(src))}, index=src.index)
+        sch_t0_dict[sch] = sch_df_dict[sch].index[0]
+        sch_csum_dict[sch] = running_sum(sch_df_dict[sch]['data'])
 
     # create a data frame for PV, file format (time, pvpowerdso1, pvpowerdso2, pvpowerdso3, ... numdso)
     for ds in power_sch:
         sch = ds[0]
-        sch_df_dict[sch] = pd.read_csv(ds[1], index_col=0, header=None)
-        sch_df_dict[sch].index = pd.to_datetime(sch_df_dict[sch].index)
-        cache_output[sch] = [0, 0]
+        sch_df_dict[sch] = pd.read_csv(ds[1], index_col=0, header=None, parse_dates=True)
+        sch_t0_dict[sch] = sch_df_dict[sch].index[0]
+        # clients map this array from shared memory, so it must not be changed
+        sch_arr_dict[sch] = sch_df_dict[sch].to_numpy(dtype=np.float64)
+        sch_arr_dict[sch].flags.writeable = False
 
     # create a data frame for tou rate schedule, file format (time, DSO_1 price, DSO_2 price, ...)
     for ds in tou_sch:
         sch = ds[0]
-        sch_df_dict[sch] = pd.read_csv(ds[1], index_col=0, header=1)
-        sch_df_dict[sch].index = pd.to_datetime(sch_df_dict[sch].index)
-        cache_output[sch] = [0, 0]
+        sch_df_dict[sch] = pd.read_csv(ds[1], index_col=0, header=1, parse_dates=True)
+        # prices are looked up by bisecting the timestamps, columns by position (0 to n-1)
+        sch_tou_dict[sch] = (sch_df_dict[sch].index.to_numpy(dtype='datetime64[ns]').view(np.int64),
+                             sch_df_dict[sch].to_numpy())
+
+    if ppc.get("shared_memory", False):
+        share_schedules()
+        # stop on SIGTERM as on <ctrl>-c, so the shared memory blocks are released
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
 
     # start the server on address(host,port)
     print('Serving data. Press <ctrl>-c to stop.')
@@ -178,7 +355,10 @@ def schedule_server(config_file, port):
     myManager.register('DataProxy', DataProxy)
     mgr = myManager(address=('', port), authkey=b'DataProxy01')
     server = mgr.get_server()
-    server.serve_forever()
+    try:
+        server.serve_forever()
+    finally:
+        release_schedules()
 
 
 def main():
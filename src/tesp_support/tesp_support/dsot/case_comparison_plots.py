@@ -491,7 +491,7 @@ def dso_cfs_delta(cases_list, data_paths_list, dso_range, metadata_file, metadat
         results_path = data_paths_list[i][1]
         comp_path = data_paths_list[i][0]
 
-        if metadata_path == None:
+        if metadata_path is None:
             path = "../../../examples/dsot_data"
         else:
             path = metadata_path
@@ -755,7 +755,7 @@ def customer_cfs_delta(cases, data_paths, metadata_file, metadata_path = None):
     # EnergyPurchased
     # BlendedRate
     # EffectiveCostEnergy
-    if metadata_path == None:
+    if metadata_path is None:
         path = "../../../examples/dsot_data"
     else:
         path = metadata_path
@@ -893,7 +893,7 @@ def customer_cfs_delta(cases, data_paths, metadata_file, metadata_path = None):
             DER_list = 'None '
         customer_comp_cfs_df.loc[customer, 'DER_participating'] = DER_list[:-1]
 
-    if subpopulation != None:
+    if subpopulation is not None:
         pop_subset = customer_cfs_df[customer_cfs_df['tariff_class'] == subpopulation]
         pop_comp_subset = customer_comp_cfs_df[customer_comp_cfs_df['tariff_class'] == subpopulation]
     else:
@@ -976,7 +976,7 @@ def customer_cfs_delta(cases, data_paths, metadata_file, metadata_path = None):
     # Plot participating customer savings by building type:
     plot_customer_pdf('Building Type', building_type, 'net_energy_cost_savings_pct', pop_subset, cases[1], data_paths[1])
 
-    if subpopulation != None:
+    if subpopulation is not None:
         pop_subset = customer_cfs_df[customer_cfs_df['tariff_class'] == subpopulation]
         pop_comp_subset = customer_comp_cfs_df[customer_comp_cfs_df['tariff_class'] == subpopulation]
     else:
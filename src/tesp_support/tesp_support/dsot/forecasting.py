@@ -22,7 +22,7 @@ import numpy as np
 import pandas as pd
 import pytz
 
-from .hvac_agent import HVACDSOT
+from .hvac_agent import HVACDSOT, SURFACE_ANGLES, WALL_TRIG, solar_flux, surface_trig
 from tesp_support.api.schedule_client import *
 
 
@@ -39,7 +39,7 @@ class Forecasting:
 
     """
 
-    def __init__(self, port, config_Q):
+    def __init__(self, port, config_Q, shared=False):
         """ Initializes the class
         TODO: update __init__
         """
@@ -47,6 +47,7 @@ class Forecasting:
            df : schedule dataframe for a year for schedule forecast
            windowLength : number of values that is to be forecast
            DA_output : forecast values as output
+           shared : read the schedules from the server's shared memory, see DataClient
         """
         self.correct_Q_DA = config_Q['correct']
         if self.correct_Q_DA:
@@ -55,7 +56,7 @@ class Forecasting:
             self.gain_t_65_2 = list(config_Q['t_65_2'])
             self.DC_change_Q_DA = list(config_Q['DC_change_Q_DA'])
 
-        self.gProxy = DataClient(port).proxy
+        self.gProxy = DataClient(port, shared=shared).proxy
         self.sch_df_dict = {}
         self.solar_df = {}
         self.windowLength = 48
@@ -63,18 +64,7 @@ class Forecasting:
         self.DA_output = []
         self.extra_forecast_hours = 24
 
-        # surface_angles from gridlabd
-        self.surface_angles = {
-            'H': 360,
-            'N': 180,
-            'NE': 135,
-            'E': 90,
-            'SE': 45,
-            'S': 0,
-            'SW': -45,
-            'W': -90,
-            'NW': -135
-        }
+        self.surface_angles = dict(SURFACE_ANGLES)
         self.solar_gain_forecast = [0.0] * 48  # creating list of 48 length with all zeros
         self.solar_direct_forecast = [0.0] * 48
         self.solar_diffuse_forecast = [0.0] * 48
@@ -350,21 +340,12 @@ class Forecasting:
                    - 7.3403 * sin(rad) - 9.4583 * sin(2 * rad) - 0.3284 * sin(3 * rad)) / 60.0
         tz_meridian = 15 * tz_offset
         std_meridian = tz_meridian * math.pi / 180
-        solar_gain_forecast = []
-        for i in range(len(time)):
-            std_time = time[i]
-            sol_time = std_time + eq_time + 12.0 / math.pi * (lon - std_meridian)
-            dnr_i = dnr[i]
-            dhr_i = dhr[i]
-            solar_flux = []
-            for cpt in self.surface_angles.keys():
-                vertical_angle = math.radians(90)
-                if cpt == 'H':
-                    vertical_angle = math.radians(0)
-                solar_flux.append(self.calc_solar_flux(cpt, day_of_yr, lat, sol_time, dnr_i, dhr_i, vertical_angle))
-            avg_solar_flux = sum(solar_flux[1:9]) / 8
-            solar_btu = avg_solar_flux * 3.412  # incident_solar_radiation is now in Btu/(h*sf)
-            solar_gain_forecast.append(solar_btu)
+        # one row per hour, one column per wall
+        sol_time = np.asarray(time, dtype=float)[:, np.newaxis] + eq_time + 12.0 / math.pi * (lon - std_meridian)
+        flux = solar_flux(WALL_TRIG, day_of_yr, lat, sol_time,
+                          np.asarray(dnr, dtype=float)[:, np.newaxis], np.asarray(dhr, dtype=float)[:, np.newaxis])
+        avg_solar_flux = flux.sum(axis=1) / 8
+        solar_gain_forecast = (avg_solar_flux * 3.412).tolist()  # incident_solar_radiation is now in Btu/(h*sf)
         return solar_gain_forecast
 
     def calc_solar_flux(self, cpt, day_of_yr, lat, sol_time, dnr_i, dhr_i, vertical_angle):
@@ -373,27 +354,7 @@ class Forecasting:
             az = math.radians(self.surface_angles['E'])
         # based on GLD calculations
         # cos_incident(lat,RAD(vert_angle),RAD(surface_angle),sol_time,doy)
-        hr_ang = -(15.0 * math.pi / 180) * (sol_time - 12.0)
-        decl = 0.409280 * sin(2.0 * math.pi * (284 + day_of_yr) / 365)
-        slope = vertical_angle
-        sindecl = sin(decl)
-        cosdecl = cos(decl)
-        sinlat = sin(lat)
-        coslat = cos(lat)
-        sinslope = sin(slope)
-        cosslope = cos(slope)
-        sinaz = sin(az)
-        cosaz = cos(az)
-        sinhr = sin(hr_ang)
-        coshr = cos(hr_ang)
-        cos_incident = sindecl * sinlat * cosslope \
-                       - sindecl * coslat * sinslope * cosaz \
-                       + cosdecl * coslat * cosslope * coshr \
-                       + cosdecl * sinlat * sinslope * cosaz * coshr \
-                       + cosdecl * sinslope * sinaz * sinhr
-        if cos_incident < 0:
-            cos_incident = 0
-        return dnr_i * cos_incident + dhr_i
+        return float(solar_flux(surface_trig(az, vertical_angle), day_of_yr, lat, sol_time, dnr_i, dhr_i))
 
     def get_solar_gain_forecast(self, climate_conf, current_time):
         lat = math.radians(float(climate_conf['latitude']))  # converting to radians
@@ -465,7 +426,7 @@ class Forecasting:
         print("***** time *****", time)
         # temp = self.solar_df.loc[pd.date_range(time, periods=self.windowLength, freq='H')][dso_num]
         temp = self.gProxy.forecasting_pv_schedules('pv_power', time, self.windowLength, dso_num)
-        return temp.values.tolist()
+        return list(temp)
 
     def set_retail_price_forecast(self, DA_SW_prices):
         """ Set substation price forecast
@@ -755,7 +755,8 @@ class Curve:
                 self.quantities[segment_start:segment_end] = np.add(self.quantities[segment_start:segment_end],
                                                                     np.linspace(bid_curve[idx][0],
                                                                                 bid_curve[idx + 1][0], len_segment))
-        if len(set(self.quantities)) > 1:
+        # once flagged the curve stays flexible, so skip the scan of the samples
+        if self.uncontrollable_only and self.quantities.min() != self.quantities.max():
             self.uncontrollable_only = False
 
     def curve_aggregator_DSO(self, substation_demand_curve):
@@ -769,7 +770,7 @@ class Curve:
         """
         self.prices = substation_demand_curve.prices
         self.quantities = np.add(self.quantities, substation_demand_curve.quantities)
-        if len(set(self.quantities)) > 1:
+        if self.uncontrollable_only and self.quantities.min() != self.quantities.max():
             self.uncontrollable_only = False
 
     def update_price_caps(self):
@@ -6,6 +6,7 @@
 TODO: update the purpose of this Agent
 
 """
+import functools
 import logging as log
 import math
 from datetime import datetime, timedelta
@@ -24,6 +25,281 @@ from tesp_support.api.parse_helpers import parse_number, parse_magnitude
 logger = log.getLogger()
 log.getLogger('pyomo.core').setLevel(log.ERROR)
 
+# Transmission coefficient through window due to glazing, by (glazing_layers, glazing_treatment),
+# with one value per window_frame (0 none, 1 aluminum, 2 thermal break, 3 wood, 4 insulated);
+# aluminum and thermal break frames share a value, as do wood and insulated frames.
+WINDOW_TRANSMISSION = {
+    (1, 1): (0.86, 0.75, 0.75, 0.64, 0.64),
+    (1, 2): (0.73, 0.64, 0.64, 0.54, 0.54),
+    (1, 3): (0.31, 0.28, 0.28, 0.24, 0.24),
+    (2, 1): (0.76, 0.67, 0.67, 0.57, 0.57),
+    (2, 2): (0.62, 0.55, 0.55, 0.46, 0.46),
+    (2, 3): (0.29, 0.27, 0.27, 0.22, 0.22),
+    (3, 1): (0.68, 0.60, 0.60, 0.51, 0.51),
+    (3, 2): (0.34, 0.31, 0.31, 0.26, 0.26),
+    (3, 3): (0.34, 0.31, 0.31, 0.26, 0.26),
+}
+
+# Resistance of the window glazing, by (glass_type, glazing_layers), with one value per
+# window_frame as for the transmission; glass_type 1 is glass and 2 is low-e glass.
+# The table lists the U-values, the agent uses their reciprocals.
+WINDOW_RESISTANCE = {key: tuple(1.0 / u for u in values) for key, values in {
+    (1, 1): (1.04, 1.27, 1.08, 0.90, 0.81),
+    (1, 2): (0.48, 0.81, 0.60, 0.53, 0.44),
+    (1, 3): (0.31, 0.67, 0.46, 0.40, 0.34),
+    (2, 2): (0.30, 0.67, 0.47, 0.41, 0.33),
+    (2, 3): (0.27, 0.64, 0.43, 0.37, 0.31),
+}.items()}
+
+
+def scheduled_setpoints(starts, set_cool, set_heat, hod4, dow3):
+    """ Returns the scheduled cooling and heating setpoints for a run of hours
+
+    Args:
+        starts (tuple): wakeup, daylight, evening, night, weekend day and weekend night start hours
+        set_cool (tuple): cooling setpoints for the same periods
+        set_heat (tuple): heating setpoints for the same periods
+        hod4 (np.ndarray): the hours of the day, counted on from midnight of dow3 up to 72
+        dow3 (int): the day of the week, zero being Monday
+    Returns:
+        (np.ndarray, np.ndarray): cooling and heating setpoints, one per hour
+    """
+    wakeup_start, daylight_start, evening_start, night_start, weekend_day_start, weekend_night_start = starts
+    hod4 = np.asarray(hod4)
+    days = (hod4 > 23).astype(int) + (hod4 >= 48)
+    hod5 = hod4 - 24 * days
+    dow4 = dow3 + days
+    dow4 = np.where(dow4 > 6, dow4 - 7, dow4)
+    weekend = dow4 > 4
+    # the weekday windows are only reached where no weekend condition matched
+    windows = [weekend & (weekend_day_start <= hod5) & (hod5 < weekend_night_start),
+               weekend,
+               (wakeup_start <= hod5) & (hod5 < daylight_start),
+               (daylight_start <= hod5) & (hod5 < evening_start),
+               (evening_start <= hod5) & (hod5 < night_start)]
+    # the setpoints in the order of the windows, the weekday night being the default
+    order = [4, 5, 0, 1, 2]
+    val_cool = np.select(windows, [set_cool[i] for i in order], set_cool[3])
+    val_heat = np.select(windows, [set_heat[i] for i in order], set_heat[3])
+    return val_cool, val_heat
+
+
+def etp_expm(A, t):
+    """ Returns the matrix exponential of A*t for the 2x2 ETP state matrix
+
+    The air/mass model has real eigenvalues m +/- s, so the exponential is
+    exp(m t) (cosh(s t) I + sinh(s t) / s (A - m I)). Unlike Sylvester's
+    formula this does not cancel as the eigenvalues get close; a complex
+    pair falls back to scipy.
+
+    Args:
+        A (np.ndarray): 2x2 state matrix of the ETP model
+        t (float): time step, in hours
+    Returns:
+        np.ndarray: 2x2 matrix exponential
+    """
+    a, b = A[0]
+    c, d = A[1]
+    half = 0.5 * (a + d)
+    disc = (a - d) * (a - d) + 4.0 * b * c
+    if disc < 0.0:
+        return linalg.expm(A * t)
+    s = 0.5 * math.sqrt(disc)
+    scale = math.exp(half * t)
+    off = scale * (math.sinh(s * t) / s if s > 0.0 else t)
+    diag = scale * math.cosh(s * t) - half * off
+    return np.array([[off * a + diag, off * b],
+                     [off * c, off * d + diag]])
+
+
+def etp_step(A, AEI, B_on, B_off, dt):
+    """ Returns the affine map that advances the ETP state by one time step
+
+    Over a step the state x goes to E x + A^-1 (E - I) B, with E = expm(A dt)
+    and B the input with the HVAC on or off.
+
+    Args:
+        A (np.ndarray): 2x2 state matrix of the ETP model
+        AEI (np.ndarray): inverse of A
+        B_on (np.ndarray): 2x1 input with the HVAC on
+        B_off (np.ndarray): 2x1 input with the HVAC off
+        dt (float): time step, in hours
+    Returns:
+        (list, list, list): rows of E, then the offsets with the HVAC on and off
+    """
+    E = etp_expm(A, dt)
+    AIE = np.dot(AEI, E) - AEI
+    return E.tolist(), np.dot(AIE, B_on).ravel().tolist(), np.dot(AIE, B_off).ravel().tolist()
+
+
+def etp_inv(A):
+    """ Returns the inverse of the 2x2 ETP state matrix
+
+    Args:
+        A (np.ndarray): 2x2 state matrix of the ETP model
+    Returns:
+        np.ndarray: 2x2 inverse
+    """
+    a, b = A[0]
+    c, d = A[1]
+    det = a * d - b * c
+    if det == 0.0:
+        raise np.linalg.LinAlgError('Singular matrix')
+    return np.array([[d / det, -b / det],
+                     [-c / det, a / det]])
+
+
+def surface_trig(az, slope):
+    """ Returns the sines and cosines of the surface angles used by solar_flux
+
+    Args:
+        az (np.ndarray): azimuths of the surfaces, in radians
+        slope (np.ndarray): slopes of the surfaces from horizontal, in radians
+    Returns:
+        (np.ndarray, np.ndarray, np.ndarray, np.ndarray): sin and cos of the azimuths, then of the slopes
+    """
+    return np.sin(az), np.cos(az), np.sin(slope), np.cos(slope)
+
+
+def solar_incidence(surface, day_of_yr, lat, sol_time):
+    """ Returns the share of the direct normal radiation incident on surfaces, following the GridLAB-D cos_incident
+
+    The surfaces broadcast against the solar time, so a column of hours
+    against a row of surfaces gives one value per pair.
+
+    Args:
+        surface (tuple): the surface angle trig, from surface_trig
+        day_of_yr (int): the day of the year
+        lat (float): latitude, in radians
+        sol_time (float or np.ndarray): solar time, in hours
+    Returns:
+        np.ndarray: cosine of the incidence angle on each surface, zero when the sun is behind it
+    """
+    sinaz, cosaz, sinslope, cosslope = surface
+    hr_ang = -(15.0 * math.pi / 180) * (sol_time - 12.0)
+    decl = 0.409280 * sin(2.0 * math.pi * (284 + day_of_yr) / 365)
+    sindecl = sin(decl)
+    cosdecl = cos(decl)
+    sinlat = sin(lat)
+    coslat = cos(lat)
+    sinhr = np.sin(hr_ang)
+    coshr = np.cos(hr_ang)
+    cos_incident = (sindecl * sinlat * cosslope -
+                    sindecl * coslat * sinslope * cosaz +
+                    cosdecl * coslat * cosslope * coshr +
+                    cosdecl * sinlat * sinslope * cosaz * coshr +
+                    cosdecl * sinslope * sinaz * sinhr)
+    return np.maximum(cos_incident, 0.0)
+
+
+def solar_flux(surface, day_of_yr, lat, sol_time, dnr, dhr):
+    """ Returns the solar flux incident on surfaces
+
+    Args:
+        surface (tuple): the surface angle trig, from surface_trig
+        day_of_yr (int): the day of the year
+        lat (float): latitude, in radians
+        sol_time (float or np.ndarray): solar time, in hours
+        dnr (float or np.ndarray): direct normal radiation
+        dhr (float or np.ndarray): diffuse horizontal radiation
+    Returns:
+        np.ndarray: solar flux on each surface
+    """
+    return dnr * solar_incidence(surface, day_of_yr, lat, sol_time) + dhr
+
+
+# surface azimuths from gridlabd, in degrees
+SURFACE_ANGLES = {
+    'H': 360,
+    'N': 180,
+    'NE': 135,
+    'E': 90,
+    'SE': 45,
+    'S': 0,
+    'SW': -45,
+    'W': -90,
+    'NW': -135
+}
+# the horizontal surface does not count towards the gain, only the eight walls
+WALL_TRIG = surface_trig(np.radians([angle for cpt, angle in SURFACE_ANGLES.items() if cpt != 'H']),
+                         math.radians(90))
+
+
+# Every agent asks for the solar gain at the same simulated times.
+@functools.lru_cache(maxsize=48)
+def central_time_terms(hour_start):
+    """ Returns the day of the year and the UTC offset of an hour of US Central time
+
+    Daylight saving changes on the hour, so the terms hold for the whole hour.
+
+    Args:
+        hour_start (datetime): the start of the hour, naive local time
+    Returns:
+        (int, int): day of the year, and the UTC offset in hours
+    """
+    tz = pytz.timezone("US/Central")  # TODO: should pull from somewhere rather than hardcoding
+    dst = tz.localize(hour_start).dst()  # to get if daylight saving is On or not
+    if dst:
+        tz_offset = -5  # when daylight saving is on, offset for central time zone is UTC-5
+    else:
+        tz_offset = -6  # otherwise UTC-6
+    day_of_yr = hour_start.timetuple().tm_yday  # get day of year from datetime
+    return day_of_yr, tz_offset
+
+
+@functools.lru_cache(maxsize=8)
+def equation_of_time(day_of_yr):
+    """ Returns the equation of time, in hours, as in the GridLAB-D climate module
+
+    Args:
+        day_of_yr (int): the day of the year
+    Returns:
+        float: equation of time, in hours
+    """
+    rad = (2.0 * math.pi * day_of_yr) / 365.0
+    return (0.5501 * cos(rad) - 3.0195 * cos(2 * rad) - 0.0771 * cos(3 * rad)
+            - 7.3403 * sin(rad) - 9.4583 * sin(2 * rad) - 0.3284 * sin(3 * rad)) / 60.0
+
+
+# Every agent subscribes to the same weather forecast messages, so each is parsed once.
+@functools.lru_cache(maxsize=4)
+def _forecast_values(fncs_str):
+    forecast = eval(fncs_str)
+    return tuple(float(forecast[key]) for key in forecast.keys())
+
+
+def parse_forecast(fncs_str):
+    """ Returns the values of a forecast message, shared by all the agents that receive it
+
+    Args:
+        fncs_str (str): forecast message, a dict of values keyed by time
+    Returns:
+        [float]: the forecast values in time order, a new list for each caller
+    """
+    return list(_forecast_values(fncs_str))
+
+
+# Houses drawn from the same schedule archetype share one set of tables.
+@functools.lru_cache(maxsize=4096)
+def schedule_tables(starts, set_cool, set_heat):
+    """ Returns the scheduled cooling and heating setpoints by day of the week and hour of the day
+
+    Args:
+        starts (tuple): wakeup, daylight, evening, night, weekend day and weekend night start hours
+        set_cool (tuple): cooling setpoints for the same periods
+        set_heat (tuple): heating setpoints for the same periods
+    Returns:
+        (tuple, tuple): cooling and heating setpoints, indexed [day][hour]
+    """
+    hours = np.arange(24)
+    table_cool = []
+    table_heat = []
+    for day in range(7):
+        val_cool, val_heat = scheduled_setpoints(starts, set_cool, set_heat, hours, day)
+        table_cool.append(tuple(val_cool.tolist()))
+        table_heat.append(tuple(val_heat.tolist()))
+    return tuple(table_cool), tuple(table_heat)
+
 
 class HVACDSOT:  # TODO: update class name
     """
@@ -92,6 +368,7 @@ class HVACDSOT:  # TODO: update class name
         self.weekend_day_set_heat = float(hvac_dict['weekend_day_set_heat'])
         self.weekend_night_set_heat = float(hvac_dict['weekend_night_set_heat'])
         self.deadband = float(hvac_dict['deadband'])
+        self.set_schedule_tables()
 
         # bid variables
         self.price_cap = float(hvac_dict['price_cap'])
@@ -109,6 +386,8 @@ class HVACDSOT:  # TODO: update class name
         self.windowLength = 48
         self.TIME = range(self.windowLength)
         self.optimized_Quantity = [[]] * self.windowLength
+        # set once a DA solution has been stored in optimized_Quantity and temp_room
+        self.has_prev_solution = False
 
         # calculated in calc_thermostat_settings
         self.range_low_cool = 0.0
@@ -216,6 +495,10 @@ class HVACDSOT:  # TODO: update class name
         self.glazing_layers = int(house_properties['glazing_layers'])
         self.glass_type = int(house_properties['glass_type'])
         self.window_frame = int(house_properties['window_frame'])
+        # the window tables are indexed by frame, where a negative frame would wrap to another one
+        if not 0 <= self.window_frame < len(WINDOW_TRANSMISSION[1, 1]):
+            raise ValueError('%s window_frame is %s, outside of the window frames 0 to %s'
+                             % (self.name, self.window_frame, len(WINDOW_TRANSMISSION[1, 1]) - 1))
         self.glazing_treatment = int(house_properties['glazing_treatment'])
         self.cooling_COP = 3.5  # float(house_properties['cooling_COP'])
         self.heating_COP = 2.5
@@ -270,17 +553,7 @@ class HVACDSOT:  # TODO: update class name
         self.dow = 0
         self.FirstTime = True
         # variables to be used in solargain calculation
-        self.surface_angles = {
-            'H': 360,
-            'N': 180,
-            'NE': 135,
-            'E': 90,
-            'SE': 45,
-            'S': 0,
-            'SW': -45,
-            'W': -90,
-            'NW': -135
-        }
+        self.surface_angles = dict(SURFACE_ANGLES)
 
         # calculated in calc_etp_model
         self.UA = 0.
@@ -325,23 +598,23 @@ class HVACDSOT:  # TODO: update class name
         if self.wakeup_start <= self.daylight_start:
             pass
         else:
-            log.log(model_diag_level, '{} {} -- wakeup_start ({}) is not < daylight_start ({}).'
-                    .format(self.name, 'init', self.wakeup_start, self.daylight_start))
+            log.log(model_diag_level, '%s %s -- wakeup_start (%s) is not < daylight_start (%s).',
+                    self.name, 'init', self.wakeup_start, self.daylight_start)
         if self.daylight_start <= self.evening_start:
             pass
         else:
-            log.log(model_diag_level, '{} {} -- daylight_start ({}) is not < evening_start ({}).'
-                    .format(self.name, 'init', self.daylight_start, self.evening_start))
+            log.log(model_diag_level, '%s %s -- daylight_start (%s) is not < evening_start (%s).',
+                    self.name, 'init', self.daylight_start, self.evening_start)
         if self.evening_start <= self.night_start:
             pass
         else:
-            log.log(model_diag_level, '{} {} -- evening_start ({}) is not < night_start ({}).'
-                    .format(self.name, 'init', self.evening_start, self.night_start))
+            log.log(model_diag_level, '%s %s -- evening_start (%s) is not < night_start (%s).',
+                    self.name, 'init', self.evening_start, self.night_start)
         if self.weekend_day_start <= self.weekend_night_start:
             pass
         else:
-            log.log(model_diag_level, '{} {} -- weekend_day_start ({}) is not < weekend_night_start ({}).'
-                    .format(self.name, 'init', self.weekend_day_start, self.weekend_night_start))
+            log.log(model_diag_level, '%s %s -- weekend_day_start (%s) is not < weekend_night_start (%s).',
+                    self.name, 'init', self.weekend_day_start, self.weekend_night_start)
         # if self.wakeup_set_heat >= self.night_set_heat:
         #     pass
         # else:
@@ -350,24 +623,24 @@ class HVACDSOT:  # TODO: update class name
         if self.daylight_set_heat <= self.night_set_heat:
             pass
         else:
-            log.log(model_diag_level, '{} {} -- daylight_set_heat ({}) is not <= night_set_heat ({}).'
-                    .format(self.name, 'init', self.daylight_set_heat, self.night_set_heat))
+            log.log(model_diag_level, '%s %s -- daylight_set_heat (%s) is not <= night_set_heat (%s).',
+                    self.name, 'init', self.daylight_set_heat, self.night_set_heat)
         if self.daylight_set_heat <= self.wakeup_set_heat:
             pass
         else:
-            log.log(model_diag_level, '{} {} -- daylight_set_heat ({}) is not <= wakeup_set_heat ({}).'
-                    .format(self.name, 'init', self.daylight_set_heat, self.wakeup_set_heat))
+            log.log(model_diag_level, '%s %s -- daylight_set_heat (%s) is not <= wakeup_set_heat (%s).',
+                    self.name, 'init', self.daylight_set_heat, self.wakeup_set_heat)
         if "zone" not in self.name:
             if self.daylight_set_cool >= self.night_set_cool:
                 pass
             else:
-                log.log(model_diag_level, '{} {} -- daylight_set_cool ({}) is not >= night_set_cool ({}).'
-                        .format(self.name, 'init', self.daylight_set_cool, self.night_set_cool))
+                log.log(model_diag_level, '%s %s -- daylight_set_cool (%s) is not >= night_set_cool (%s).',
+                        self.name, 'init', self.daylight_set_cool, self.night_set_cool)
             if self.daylight_set_cool >= self.wakeup_set_cool:
                 pass
             else:
-                log.log(model_diag_level, '{} {} -- daylight_set_cool ({}) is not >= wakeup_set_cool ({}).'
-                        .format(self.name, 'init', self.daylight_set_cool, self.wakeup_set_cool))
+                log.log(model_diag_level, '%s %s -- daylight_set_cool (%s) is not >= wakeup_set_cool (%s).',
+                        self.name, 'init', self.daylight_set_cool, self.wakeup_set_cool)
             # if self.evening_set_heat >= self.night_set_heat:
             #     pass
             # else:
@@ -381,74 +654,74 @@ class HVACDSOT:  # TODO: update class name
         if self.sqft > 0:
             pass
         else:
-            log.log(model_diag_level, '{} {} -- number of sqft ({}) is negative value'
-                    .format(self.name, 'init', self.sqft))
+            log.log(model_diag_level, '%s %s -- number of sqft (%s) is negative value',
+                    self.name, 'init', self.sqft)
         if self.stories > 0:
             pass
         else:
-            log.log(model_diag_level, '{} {} -- number of stories ({}) is negative'
-                    .format(self.name, 'init', self.stories))
+            log.log(model_diag_level, '%s %s -- number of stories (%s) is negative',
+                    self.name, 'init', self.stories)
         if self.doors >= 0:
             pass
         else:
-            log.log(model_diag_level, '{} {} -- number of doors ({}) is negative'
-                    .format(self.name, 'init', self.doors))
+            log.log(model_diag_level, '%s %s -- number of doors (%s) is negative',
+                    self.name, 'init', self.doors)
 
         Rroof_lower = 2
         Rroof_upper = 60
         if Rroof_lower <= self.Rroof < Rroof_upper:
             pass
         else:
-            log.log(model_diag_level, '{} {} --  Rroof is {}, outside of nominal range of {} to {}'
-                    .format(self.name, 'init', self.Rroof, Rroof_lower, Rroof_upper))
+            log.log(model_diag_level, '%s %s --  Rroof is %s, outside of nominal range of %s to %s',
+                    self.name, 'init', self.Rroof, Rroof_lower, Rroof_upper)
 
         Rwall_lower = 2
         Rwall_upper = 40
         if Rwall_lower <= self.Rwall < Rwall_upper:
             pass
         else:
-            log.log(model_diag_level, '{} {} -- Rwall is {}, outside of nominal range of {} to {}'
-                    .format(self.name, 'init', self.Rwall, Rwall_lower, Rwall_upper))
+            log.log(model_diag_level, '%s %s -- Rwall is %s, outside of nominal range of %s to %s',
+                    self.name, 'init', self.Rwall, Rwall_lower, Rwall_upper)
 
         Rfloor_lower = 2
         Rfloor_upper = 40
         if Rfloor_lower <= self.Rfloor < Rfloor_upper:
             pass
         else:
-            log.log(model_diag_level, '{} {} -- Rfloor is {}, outside of nominal range of {} to {}'
-                    .format(self.name, 'init', self.Rfloor, Rfloor_lower, Rfloor_upper))
+            log.log(model_diag_level, '%s %s -- Rfloor is %s, outside of nominal range of %s to %s',
+                    self.name, 'init', self.Rfloor, Rfloor_lower, Rfloor_upper)
 
         Rdoor_lower = 1
         Rdoor_upper = 20
         if Rdoor_lower <= self.Rdoors < Rdoor_upper:
             pass
         else:
-            log.log(model_diag_level, '{} {} -- Rdoors is {}, outside of nominal range of {} to {}'
-                    .format(self.name, 'init', self.Rdoors, Rdoor_lower, Rdoor_upper))
+            log.log(model_diag_level, '%s %s -- Rdoors is %s, outside of nominal range of %s to %s',
+                    self.name, 'init', self.Rdoors, Rdoor_lower, Rdoor_upper)
 
         airchange_per_hour_lower = 0.1
         airchange_per_hour_upper = 6.5
         if airchange_per_hour_lower <= self.airchange_per_hour < airchange_per_hour_upper:
             pass
         else:
-            log.log(model_diag_level, '{} {} -- airchange_per_hour is {}, outside of nominal range of {} to {}.'
-                    .format(self.name, 'init', self.airchange_per_hour, airchange_per_hour_lower, airchange_per_hour_upper))
+            log.log(model_diag_level, '%s %s -- airchange_per_hour is %s, outside of nominal range of %s to %s.',
+                    self.name, 'init', self.airchange_per_hour, airchange_per_hour_lower, airchange_per_hour_upper)
 
         glazing_layers_lower = 1
         glazing_layers_upper = 3
         if glazing_layers_lower <= self.glazing_layers <= glazing_layers_upper:
             pass
         else:
-            log.log(model_diag_level, '{} {} -- glazing_layers is (are) {}, outside of nominal range of {} to {}'
-                    .format(self.name, 'init', self.glazing_layers, glazing_layers_lower, glazing_layers_upper))
+            log.log(model_diag_level, '%s %s -- glazing_layers is (are) %s, outside of nominal range of %s to %s',
+                    self.name, 'init', self.glazing_layers, glazing_layers_lower, glazing_layers_upper)
 
         cooling_COP_lower = 1
         cooling_COP_upper = 10
         if cooling_COP_lower <= self.cooling_COP <= cooling_COP_upper:
             pass
         else:
-            log.log(model_diag_level, '{} {} -- cooling_COP is {}, outside of nominal range of {} to {}'
-                    .format(self.name, 'init', self.cooling_COP, cooling_COP_lower, cooling_COP_upper))
+            log.log(model_diag_level, '%s %s -- cooling_COP is %s, outside of nominal range of %s to %s',
+                    self.name, 'init', self.cooling_COP, cooling_COP_lower, cooling_COP_upper)
 
     def calc_thermostat_settings(self, model_diag_level, sim_time):
         """ Sets the ETP parameters from configuration data
@@ -539,18 +812,23 @@ class HVACDSOT:  # TODO: update class name
                 self.temp_max_heat = heating_setpt
 
     def update_temp_limits_da(self, cooling_setpt, heating_setpt):
+        """ Sets the DA temperature limits around the scheduled setpoints
+
+        Args:
+            cooling_setpt (np.ndarray): cooling setpoints, one per hour of the DA window
+            heating_setpt (np.ndarray): heating setpoints, one per hour of the DA window
+        """
         self.temp_max_cool_da = cooling_setpt + self.range_high_cool  # - self.ramp_high_limit * (1 - self.slider)
         self.temp_min_cool_da = cooling_setpt - self.range_low_cool  # + self.ramp_low_limit * (1 - self.slider)
         self.temp_max_heat_da = heating_setpt + self.range_high_heat  # - self.ramp_high_limit * (1 - self.slider)
         self.temp_min_heat_da = heating_setpt - self.range_low_heat  # + self.ramp_low_limit * (1 - self.slider)
-        if self.temp_max_heat_da + self.deadband / 2.0 + 0.5 > self.temp_min_cool_da - self.deadband / 2.0 - 0.5:
-            mid_point = (self.temp_min_cool_da + self.temp_max_heat_da) / 2.0
-            self.temp_min_cool_da = mid_point + self.deadband / 2.0 + 0.5
-            self.temp_max_heat_da = mid_point - self.deadband / 2.0 - 0.5
-            if self.temp_min_cool_da > cooling_setpt:
-                self.temp_min_cool_da = cooling_setpt
-            if self.temp_max_heat_da < heating_setpt:
-                self.temp_max_heat_da = heating_setpt
+        # where the heating and cooling ranges overlap, split them at the mid point
+        overlap = self.temp_max_heat_da + self.deadband / 2.0 + 0.5 > self.temp_min_cool_da - self.deadband / 2.0 - 0.5
+        mid_point = (self.temp_min_cool_da + self.temp_max_heat_da) / 2.0
+        self.temp_min_cool_da = np.where(overlap, np.minimum(mid_point + self.deadband / 2.0 + 0.5, cooling_setpt),
+                                         self.temp_min_cool_da)
+        self.temp_max_heat_da = np.where(overlap, np.maximum(mid_point - self.deadband / 2.0 - 0.5, heating_setpt),
+                                         self.temp_max_heat_da)
 
     def calc_etp_model(self):
         """ Sets the ETP parameters from configuration data
@@ -563,135 +841,15 @@ class HVACDSOT:  # TODO: update class name
         Rf = self.Rfloor
 
         # self.Rwindows  # g for glazing
-        if self.glass_type == 2:
-            if self.glazing_layers == 1:
-                print("error: no value for one pane of low-e glass")
-            elif self.glazing_layers == 2:
-                if self.window_frame == 0:
-                    Rg = 1.0 / 0.30
-                elif self.window_frame == 1:
-                    Rg = 1.0 / 0.67
-                elif self.window_frame == 2:
-                    Rg = 1.0 / 0.47
-                elif self.window_frame == 3:
-                    Rg = 1.0 / 0.41
-                elif self.window_frame == 4:
-                    Rg = 1.0 / 0.33
-            elif self.glazing_layers == 3:
-                if self.window_frame == 0:
-                    Rg = 1.0 / 0.27
-                elif self.window_frame == 1:
-                    Rg = 1.0 / 0.64
-                elif self.window_frame == 2:
-                    Rg = 1.0 / 0.43
-                elif self.window_frame == 3:
-                    Rg = 1.0 / 0.37
-                elif self.window_frame == 4:
-                    Rg = 1.0 / 0.31
-        elif self.glass_type == 1:
-            if self.glazing_layers == 1:
-                if self.window_frame == 0:
-                    Rg = 1.0 / 1.04
-                elif self.window_frame == 1:
-                    Rg = 1.0 / 1.27
-                elif self.window_frame == 2:
-                    Rg = 1.0 / 1.08
-                elif self.window_frame == 3:
-                    Rg = 1.0 / 0.90
-                elif self.window_frame == 4:
-                    Rg = 1.0 / 0.81
-            elif self.glazing_layers == 2:
-                if self.window_frame == 0:
-                    Rg = 1.0 / 0.48
-                elif self.window_frame == 1:
-                    Rg = 1.0 / 0.81
-                elif self.window_frame == 2:
-                    Rg = 1.0 / 0.60
-                elif self.window_frame == 3:
-                    Rg = 1.0 / 0.53
-                elif self.window_frame == 4:
-                    Rg = 1.0 / 0.44
-            elif self.glazing_layers == 3:
-                if self.window_frame == 0:
-                    Rg = 1.0 / 0.31
-                elif self.window_frame == 1:
-                    Rg = 1.0 / 0.67
-                elif self.window_frame == 2:
-                    Rg = 1.0 / 0.46
-                elif self.window_frame == 3:
-                    Rg = 1.0 / 0.40
-                elif self.window_frame == 4:
-                    Rg = 1.0 / 0.34
-        elif self.glass_type == 0:
+        if self.glass_type == 0:
             Rg = 2.0
+        else:
+            if self.glass_type == 2 and self.glazing_layers == 1:
+                print("error: no value for one pane of low-e glass")
+            Rg = WINDOW_RESISTANCE[self.glass_type, self.glazing_layers][self.window_frame]
 
         # transmission coefficient through window due to glazing
-        if self.glazing_layers == 1:
-            if self.glazing_treatment == 1:
-                if self.window_frame == 0:
-                    Wg = 0.86
-                elif self.window_frame == 1 or self.window_frame == 2:
-                    Wg = 0.75
-                elif self.window_frame == 3 or self.window_frame == 4:
-                    Wg = 0.64
-            elif self.glazing_treatment == 2:
-                if self.window_frame == 0:
-                    Wg = 0.73
-                elif self.window_frame == 1 or self.window_frame == 2:
-                    Wg = 0.64
-                elif self.window_frame == 3 or self.window_frame == 4:
-                    Wg = 0.54
-            elif self.glazing_treatment == 3:
-                if self.window_frame == 0:
-                    Wg = 0.31
-                elif self.window_frame == 1 or self.window_frame == 2:
-                    Wg = 0.28
-                elif self.window_frame == 3 or self.window_frame == 4:
-                    Wg = 0.24
-        elif self.glazing_layers == 2:
-            if self.glazing_treatment == 1:
-                if self.window_frame == 0:
-                    Wg = 0.76
-                elif self.window_frame == 1 or self.window_frame == 2:
-                    Wg = 0.67
-                elif self.window_frame == 3 or self.window_frame == 4:
-                    Wg = 0.57
-            elif self.glazing_treatment == 2:
-                if self.window_frame == 0:
-                    Wg = 0.62
-                elif self.window_frame == 1 or self.window_frame == 2:
-                    Wg = 0.55
-                elif self.window_frame == 3 or self.window_frame == 4:
-                    Wg = 0.46
-            elif self.glazing_treatment == 3:
-                if self.window_frame == 0:
-                    Wg = 0.29
-                elif self.window_frame == 1 or self.window_frame == 2:
-                    Wg = 0.27
-                elif self.window_frame == 3 or self.window_frame == 4:
-                    Wg = 0.22
-        elif self.glazing_layers == 3:
-            if self.glazing_treatment == 1:
-                if self.window_frame == 0:
-                    Wg = 0.68
-                elif self.window_frame == 1 or self.window_frame == 2:
-                    Wg = 0.60
-                elif self.window_frame == 3 or self.window_frame == 4:
-                    Wg = 0.51
-            elif self.glazing_treatment == 2:
-                if self.window_frame == 0:
-                    Wg = 0.34
-                elif self.window_frame == 1 or self.window_frame == 2:
-                    Wg = 0.31
-                elif self.window_frame == 3 or self.window_frame == 4:
-                    Wg = 0.26
-            elif self.glazing_treatment == 3:
-                if self.window_frame == 0:
-                    Wg = 0.34
-                elif self.window_frame == 1 or self.window_frame == 2:
-                    Wg = 0.31
-                elif self.window_frame == 3 or self.window_frame == 4:
-                    Wg = 0.26
+        Wg = WINDOW_TRANSMISSION[self.glazing_layers, self.glazing_treatment][self.window_frame]
 
         Rd = self.Rdoors
         I = self.airchange_per_hour
@@ -784,13 +942,13 @@ class HVACDSOT:  # TODO: update class name
             round_value = self.design_heating_capacity / 10000.0
             self.design_heating_capacity = math.ceil(round_value) * 10000.0
 
-        log.debug('ETP model ' + self.name)
-        log.debug('  UA -> {:.2f}'.format(self.UA))
+        log.debug('ETP model %s', self.name)
+        log.debug('  UA -> %.2f', self.UA)
         # print('  UA -> {:.2f}'.format(self.UA))
-        log.debug('  CA -> {:.2f}'.format(self.CA))
+        log.debug('  CA -> %.2f', self.CA)
         # print('  CA -> {:.2f}'.format(self.CA))
-        log.debug('  HM -> {:.2f}'.format(self.HM))
-        log.debug('  CM -> {:.2f}'.format(self.CM))
+        log.debug('  HM -> %.2f', self.HM)
+        log.debug('  CM -> %.2f', self.CM)
         # print('  CM -> {:.2f}'.format(self.CM))
 
     def set_price_forecast(self, price_forecast):
@@ -802,9 +960,10 @@ class HVACDSOT:  # TODO: update class name
         self.price_forecast = price_forecast[:]
         # print("self.price_forecast")
         # print(self.price_forecast)
-        self.price_mean = np.mean(self.price_forecast)
-        self.price_std_dev = np.std(self.price_forecast)
-        self.price_delta = np.max(self.price_forecast) - np.min(self.price_forecast)
+        prices = np.array(self.price_forecast)
+        self.price_mean = prices.mean()
+        self.price_std_dev = prices.std()
+        self.price_delta = prices.max() - prices.min()
 
     def set_temperature_forecast(self, fncs_str):
         """ Set the 48-hour price forecast and calculate min and max
@@ -813,8 +972,7 @@ class HVACDSOT:  # TODO: update class name
             fncs_str: temperature_forecast ([float x 48]): predicted temperature in F
         """
 
-        temperature_forecast = eval(fncs_str)
-        self.temperature_forecast = [float(temperature_forecast[key]) for key in temperature_forecast.keys()]
+        self.temperature_forecast = parse_forecast(fncs_str)
         # print ("temperature forecast inside function")
         # print(self)
         # print (self.temperature_forecast)
@@ -828,8 +986,7 @@ class HVACDSOT:  # TODO: update class name
             fncs_str: temperature_forecast ([float x 48]): predicted temperature in F
         """
 
-        humidity_forecast = eval(fncs_str)
-        self.humidity_forecast = [float(humidity_forecast[key]) for key in humidity_forecast.keys()]
+        self.humidity_forecast = parse_forecast(fncs_str)
 
     def set_solargain_forecast(self, solargain_array):
         """ Set the 48-hour solargain forecast
@@ -923,13 +1080,7 @@ class HVACDSOT:  # TODO: update class name
         """
         lat = math.radians(float(climate_conf['latitude']))  # converting to radians
         lon = math.radians(float(climate_conf['longitude']))
-        tz = pytz.timezone("US/Central")  # TODO: should pull from somewhere rather than hardcoding
-        dst = tz.localize(current_time).dst()  # to get if daylight saving is On or not
-        if dst:
-            tz_offset = -5  # when daylight saving is on, offset for central time zone is UTC-5
-        else:
-            tz_offset = -6  # otherwise UTC-6
-        day_of_yr = current_time.timetuple().tm_yday  # get day of year from datetime
+        day_of_yr, tz_offset = central_time_terms(current_time.replace(minute=0, second=0, microsecond=0))
         dnr = self.solar_direct
         dhr = self.solar_diffuse
         # start_hour = math.ceil(current_time.hour + current_time.minute/60)
@@ -941,21 +1092,13 @@ class HVACDSOT:  # TODO: update class name
 
     def calc_solargain(self, day_of_yr, start_hour, dnr, dhr, lat, lon, tz_offset):
         # implementing gridlabd solargain calculation from climate.cpp and house_e.cpp
-        rad = (2.0 * math.pi * day_of_yr) / 365.0
-        eq_time = (0.5501 * cos(rad) - 3.0195 * cos(2 * rad) - 0.0771 * cos(3 * rad)
-                   - 7.3403 * sin(rad) - 9.4583 * sin(2 * rad) - 0.3284 * sin(3 * rad)) / 60.0
+        eq_time = equation_of_time(day_of_yr)
         tz_meridian = 15 * tz_offset
         std_meridian = tz_meridian * math.pi / 180
-        solar_gain = []
         std_time = start_hour
         sol_time = std_time + eq_time + 12.0 / math.pi * (lon - std_meridian)
-        solar_flux = []
-        for cpt in self.surface_angles.keys():
-            vertical_angle = math.radians(90)
-            if cpt == 'H':
-                vertical_angle = math.radians(0)
-            solar_flux.append(self.calc_solar_flux(cpt, day_of_yr, lat, sol_time, dnr, dhr, vertical_angle))
-        avg_solar_flux = sum(solar_flux[1:9]) / 8
+        flux = solar_flux(WALL_TRIG, day_of_yr, lat, sol_time, dnr, dhr)
+        avg_solar_flux = sum(flux.tolist()) / 8
         solar_gain = avg_solar_flux * 3.412  # incident_solar_radiation is now in Btu/(h*sf)
         return solar_gain
 
@@ -965,27 +1108,7 @@ class HVACDSOT:  # TODO: update class name
             az = math.radians(self.surface_angles['E'])
         # based on GLD calculations
         # cos_incident(lat,RAD(vert_angle),RAD(surface_angle),sol_time,doy)
-        hr_ang = -(15.0 * math.pi / 180) * (sol_time - 12.0)
-        decl = 0.409280 * sin(2.0 * math.pi * (284 + day_of_yr) / 365)
-        slope = vertical_angle
-        sindecl = sin(decl)
-        cosdecl = cos(decl)
-        sinlat = sin(lat)
-        coslat = cos(lat)
-        sinslope = sin(slope)
-        cosslope = cos(slope)
-        sinaz = sin(az)
-        cosaz = cos(az)
-        sinhr = sin(hr_ang)
-        coshr = cos(hr_ang)
-        cos_incident = (sindecl * sinlat * cosslope -
-                        sindecl * coslat * sinslope * cosaz +
-                        cosdecl * coslat * cosslope * coshr +
-                        cosdecl * sinlat * sinslope * cosaz * coshr +
-                        cosdecl * sinslope * sinaz * sinhr)
-        if cos_incident < 0:
-            cos_incident = 0
-        return dnr_i * cos_incident + dhr_i
+        return float(solar_flux(surface_trig(az, vertical_angle), day_of_yr, lat, sol_time, dnr_i, dhr_i))
 
     def inform_bid(self, price):
         """ Set the cleared_price attribute
@@ -1061,7 +1184,8 @@ class HVACDSOT:  # TODO: update class name
             else:
                 ramp_high_tmp = 10000000000000.0
                 ramp_low_tmp = 10000000000000.0
-                log.log(model_diag_level, '{} {} -- thermostat mode not defined.'.format(self.name, sim_time))
+                log.log(model_diag_level, '%s %s -- thermostat mode not defined.',
+                        self.name, sim_time)
             use_RT_curve = True
             use_DA_curve = False
             use_leg_clearing = False
@@ -1152,18 +1276,18 @@ class HVACDSOT:  # TODO: update class name
                 pass
             else:
                 log.log(model_diag_level,
-                        '{} {} -- cooling_setpoint ({}), outside of nominal range {} to {}'
-                        .format(self.name, sim_time, self.cooling_setpoint, self.cooling_setpoint_lower,
-                                self.cooling_setpoint_upper))
+                        '%s %s -- cooling_setpoint (%s), outside of nominal range %s to %s',
+                        self.name, sim_time, self.cooling_setpoint, self.cooling_setpoint_lower,
+                        self.cooling_setpoint_upper)
         else:
             self.heating_setpoint = setpoint_tmp
             if self.heating_setpoint_lower < self.heating_setpoint < self.heating_setpoint_upper:
                 pass
             else:
                 log.log(model_diag_level,
-                        '{} {} -- heating_setpoint ({}), outside of nominal range of {} to {}'
-                        .format(self.name, sim_time, self.heating_setpoint, self.heating_setpoint_lower,
-                                self.heating_setpoint_upper))
+                        '%s %s -- heating_setpoint (%s), outside of nominal range of %s to %s',
+                        self.name, sim_time, self.heating_setpoint, self.heating_setpoint_lower,
+                        self.heating_setpoint_upper)
 
         if self.heating_setpoint + self.deadband / 2.0 >= self.cooling_setpoint - self.deadband / 2.0:
             if self.thermostat_mode == 'Heating':
@@ -1177,43 +1301,40 @@ class HVACDSOT:  # TODO: update class name
         # update agent air temp for debugging
         T = (self.bid_delay + self.period) / 3600.0
         time = np.linspace(0, T, num=10)
-        x = np.zeros([2, 1])
-        x[0] = self.air_temp
-        x[1] = self.mass_temp
+        x0 = float(self.air_temp)
+        x1 = float(self.mass_temp)
         hvac_on_tmp = self.hvac_on
+        # switching thresholds, signed so that both modes use the same compare;
+        # with the thermostat off the sign is 0 and the HVAC never switches
+        sign = 1.0 if self.thermostat_mode == 'Cooling' else -1.0 if self.thermostat_mode == 'Heating' else 0.0
+        setpoint = self.heating_setpoint if self.thermostat_mode == 'Heating' else self.cooling_setpoint
+        turn_off = sign * setpoint - self.deadband / 2.0
+        turn_on = sign * setpoint + self.deadband / 2.0
+        # the step is the same for every interval
+        ((e00, e01), (e10, e11)), (c0_on, c1_on), (c0_off, c1_off) = etp_step(
+            self.A_ETP, self.AEI, self.B_ETP_ON, self.B_ETP_OFF, T / 10.0)
         for itime in range(1, len(time)):
-            eAET = linalg.expm(self.A_ETP * T / 10.0)
-            AIET = np.dot(self.AEI, eAET)
-            AEx = np.dot(self.A_ETP, x)
             if hvac_on_tmp:
-                AxB = AEx + self.B_ETP_ON
-                AIB = np.dot(self.AEI, self.B_ETP_ON)
-                AExB = np.dot(AIET, AxB)
-                x = AExB - AIB
+                x0, x1 = e00 * x0 + e01 * x1 + c0_on, e10 * x0 + e11 * x1 + c1_on
                 # temp[itime] = xn[0]
                 # self.mass_temp = xn[1]
                 # check if HVAC changes status
                 # temp_curve_tmp[itime] = x[0][0]
                 # Q_max = time[itime] * self.hvac_kw / T
-                if (x[0][0] < self.cooling_setpoint - self.deadband / 2.0 and self.thermostat_mode == 'Cooling') or \
-                        (x[0][0] > self.heating_setpoint + self.deadband / 2.0 and self.thermostat_mode == 'Heating'):
+                if sign * x0 < turn_off:
                     hvac_on_tmp = False
             else:
-                AxB = AEx + self.B_ETP_OFF
-                AIB = np.dot(self.AEI, self.B_ETP_OFF)
-                AExB = np.dot(AIET, AxB)
-                x = AExB - AIB  # + self.deadband/2.0
+                x0, x1 = e00 * x0 + e01 * x1 + c0_off, e10 * x0 + e11 * x1 + c1_off  # + self.deadband/2.0
                 # temp[itime] = x[0]
                 # self.mass_temp = x[1]
                 # temp_curve_tmp[itime] = x[0][0]
                 # Q_min = (T - time[itime]) * self.hvac_kw / T
-                if (x[0][0] > self.cooling_setpoint + self.deadband / 2.0 and self.thermostat_mode == 'Cooling') or \
-                        (x[0][0] < self.heating_setpoint - self.deadband / 2.0 and self.thermostat_mode == 'Heating'):
+                if sign * x0 > turn_on:
                     hvac_on_tmp = True
             # temp[itime] = x[0][0]  # this should be updated for each itime
 
-        self.air_temp_agent = x[0][0]  # this gets updated at the end
-        self.mass_temp = x[1][0]  # this gets updated at the end
+        self.air_temp_agent = x0  # this gets updated at the end
+        self.mass_temp = x1  # this gets updated at the end
 
         # if self.name == "R4_12_47_1_tn_9_hse_1":
         #     print("RT clearing",self.name,sim_time,self.hvac_on,self.hvac_kw)
@@ -1235,6 +1356,25 @@ class HVACDSOT:  # TODO: update class name
         self.hour = hour
         self.day = day
 
+    def get_schedule(self):
+        """ Returns the thermostat schedule as start times, cooling setpoints and heating setpoints
+
+        Each is a tuple ordered wakeup, daylight, evening, night, weekend day, weekend night.
+        """
+        return ((self.wakeup_start, self.daylight_start, self.evening_start, self.night_start,
+                 self.weekend_day_start, self.weekend_night_start),
+                (self.wakeup_set_cool, self.daylight_set_cool, self.evening_set_cool, self.night_set_cool,
+                 self.weekend_day_set_cool, self.weekend_night_set_cool),
+                (self.wakeup_set_heat, self.daylight_set_heat, self.evening_set_heat, self.night_set_heat,
+                 self.weekend_day_set_heat, self.weekend_night_set_heat))
+
+    def set_schedule_tables(self):
+        """ Tabulates the time-scheduled thermostat settings by day of the week and hour of the day
+
+        Must be called again if the schedule start times or setpoints are changed.
+        """
+        self.schedule_cool, self.schedule_heat = schedule_tables(*self.get_schedule())
+
     def change_basepoint(self, model_diag_level, sim_time):
         """ Updates the time-scheduled thermostat setting
 
@@ -1246,39 +1386,23 @@ class HVACDSOT:  # TODO: update class name
             bool: True if the setting changed, False if not
         """
 
-        if self.day > 4:  # a weekend
-            val_cool = self.weekend_night_set_cool
-            val_heat = self.weekend_night_set_heat
-            if self.weekend_day_start <= self.hour < self.weekend_night_start:
-                val_cool = self.weekend_day_set_cool
-                val_heat = self.weekend_day_set_heat
-        else:  # a weekday
-            val_cool = self.night_set_cool
-            val_heat = self.night_set_heat
-            if self.wakeup_start <= self.hour < self.daylight_start:
-                val_cool = self.wakeup_set_cool
-                val_heat = self.wakeup_set_heat
-            elif self.daylight_start <= self.hour < self.evening_start:
-                val_cool = self.daylight_set_cool
-                val_heat = self.daylight_set_heat
-            elif self.evening_start <= self.hour < self.night_start:
-                val_cool = self.evening_set_cool
-                val_heat = self.evening_set_heat
+        val_cool = self.schedule_cool[self.day][self.hour]
+        val_heat = self.schedule_heat[self.day][self.hour]
         if abs(self.basepoint_cooling - val_cool) > 0.1 or abs(self.basepoint_heating - val_heat) > 0.1:
             self.basepoint_cooling = val_cool
             if 65 < self.basepoint_cooling < 85:
                 # log.info('basepoint_cooling is within the bounds.')
                 pass
             else:
-                log.log(model_diag_level, '{} {} -- basepoint_cooling ({}) is out of bounds.'
-                        .format(self.name, sim_time, self.basepoint_cooling))
+                log.log(model_diag_level, '%s %s -- basepoint_cooling (%s) is out of bounds.',
+                        self.name, sim_time, self.basepoint_cooling)
             self.basepoint_heating = val_heat
             if 60 < self.basepoint_heating < 85:
                 # log.info('basepoint_heating is within the bounds.')
                 pass
             else:
-                log.log(model_diag_level, '{} {} -- basepoint_heating ({}) is out of bounds.'
-                        .format(self.name, sim_time, self.basepoint_heating))
+                log.log(model_diag_level, '%s %s -- basepoint_heating (%s) is out of bounds.',
+                        self.name, sim_time, self.basepoint_heating)
             self.calc_thermostat_settings(model_diag_level, sim_time)  # update thermostat settings
             return True
         return False
@@ -1340,11 +1464,11 @@ class HVACDSOT:  # TODO: update class name
             if self.air_temp - 20 < T_air < self.air_temp + 20:
                 T_air = self.air_temp
                 log.log(model_diag_level,
-                        '{} Severe Warning temp {}: 20 degree swing, setting to last temperature'
-                        .format(self.name, T_air))
+                        '%s Severe Warning temp %s: 20 degree swing, setting to last temperature',
+                        self.name, T_air)
             log.log(model_diag_level,
-                    '{} {} -- air_temp ({}) is out of bounds, outside of nominal range of {} to {}.'
-                    .format(self.name, sim_time, self.air_temp, self.T_lower_limit, self.T_upper_limit))
+                    '%s %s -- air_temp (%s) is out of bounds, outside of nominal range of %s to %s.',
+                    self.name, sim_time, self.air_temp, self.T_lower_limit, self.T_upper_limit)
         self.air_temp = T_air
 
         # This is a correction within the hour for the DA prediction of thermostat mode using heating as default
@@ -1378,12 +1502,13 @@ class HVACDSOT:  # TODO: update class name
             return self.bid_rt
 
         # adjust capacity and COP based on outdoor temperature
+        outside_temp = self.outside_air_temperature
         cooling_capacity_adj = self.design_cooling_capacity * (
-                self.cooling_capacity_K0 + self.cooling_capacity_K1 * self.outside_air_temperature)
+                self.cooling_capacity_K0 + self.cooling_capacity_K1 * outside_temp)
 
         heating_capacity_adj = self.design_heating_capacity * (
-                self.heating_capacity_K0 + self.heating_capacity_K1 * self.outside_air_temperature
-                + self.heating_capacity_K2 * self.outside_air_temperature * self.outside_air_temperature)
+                self.heating_capacity_K0 + self.heating_capacity_K1 * outside_temp
+                + self.heating_capacity_K2 * outside_temp * outside_temp)
 
         # TODO: need to check if this is needed anymore
         if self.thermostat_mode == 'Heating':
@@ -1438,7 +1563,7 @@ class HVACDSOT:  # TODO: update class name
             self.B_ETP_ON[1] = QM / self.CM
             self.B_ETP_OFF[1] = QM / self.CM
 
-        self.AEI = np.linalg.inv(self.A_ETP)
+        self.AEI = etp_inv(self.A_ETP)
 
         # interpolating the DA quantities into RT
         if self.interpolation:
@@ -1459,11 +1584,8 @@ class HVACDSOT:  # TODO: update class name
         time = np.linspace(0, T, num=10)  # [0,topt-dt, topt, topt+dt]
         # TODO: this needs to be more generic, like a function of slider
         npt = 5
-        self.temp_curve = []
-        self.quantity_curve = []
-        for i in range(npt):
-            self.temp_curve.append(Topt_DA + (i - 2) / 4.0 * self.slider)
-            self.quantity_curve.append(0.0)
+        self.temp_curve = [Topt_DA + (i - 2) / 4.0 * self.slider for i in range(npt)]
+        self.quantity_curve = [0.0] * npt
 
         # if self.name == "R4_12_47_1_tn_9_hse_1":
         #     print("RT bidding",self.name,sim_time,self.hvac_on,self.hvac_kw,self.thermostat_mode)
@@ -1472,10 +1594,14 @@ class HVACDSOT:  # TODO: update class name
         #     print(self.outside_air_temperature,self.air_temp,self.mass_temp)
         #     print(Qs,Qi,QM,Qa_OFF,Qa_ON)
 
+        # signed switching thresholds, as in bid_accepted
+        sign = 1.0 if self.thermostat_mode == 'Cooling' else -1.0 if self.thermostat_mode == 'Heating' else 0.0
+        # the step is the same for every point and interval
+        ((e00, e01), (e10, e11)), (c0_on, c1_on), (c0_off, c1_off) = etp_step(
+            self.A_ETP, self.AEI, self.B_ETP_ON, self.B_ETP_OFF, T / 10.0)
         for itemp in range(npt):
-            x = np.zeros([2, 1])
-            x[0] = self.air_temp
-            x[1] = self.mass_temp
+            x0 = float(self.air_temp)
+            x1 = float(self.mass_temp)
             Q_max = self.hvac_kw
             Q_min = 0.0
 
@@ -1487,6 +1613,8 @@ class HVACDSOT:  # TODO: update class name
                   (self.thermostat_mode == "Cooling" and not self.hvac_on)):
                 self.temp_curve[0] = self.air_temp - self.deadband / 2.0
             hvac_on_tmp = self.hvac_on
+            turn_off = sign * self.temp_curve[itemp] - self.deadband / 2.0
+            turn_on = sign * self.temp_curve[itemp] + self.deadband / 2.0
             last_T_off = 0
             last_T_on = 0
             Q_total = 0
@@ -1496,14 +1624,8 @@ class HVACDSOT:  # TODO: update class name
             # 3 - find the bid when HVAC is OFF
             for itime in range(1, len(time)):
                 # this is based on the assumption that only one status change happens in 5-min period
-                eAET = linalg.expm(self.A_ETP * T / 10.0)
-                AIET = np.dot(self.AEI, eAET)
-                AEx = np.dot(self.A_ETP, x)
                 if hvac_on_tmp:
-                    AxB = AEx + self.B_ETP_ON
-                    AIB = np.dot(self.AEI, self.B_ETP_ON)
-                    AExB = np.dot(AIET, AxB)
-                    x = AExB - AIB
+                    x0, x1 = e00 * x0 + e01 * x1 + c0_on, e10 * x0 + e11 * x1 + c1_on
                     # if self.thermostat_mode == "Cooling":
                     #     # self.temp_curve[0] = self.air_temp + self.deadband / 2.0
                     #     self.temp_curve[itime] = x[0][0] + self.deadband/2.0
@@ -1513,16 +1635,10 @@ class HVACDSOT:  # TODO: update class name
                     # last_T_on = time[itime]
                     Q_total += 1 / 10 * self.hvac_kw
                     # self.quantity_curve[itime] = (time[itime]-last_T_off) * self.hvac_kw / T
-                    if ((x[0][0] < self.temp_curve[itemp] - self.deadband / 2.0 and
-                         self.thermostat_mode == 'Cooling') or
-                            (x[0][0] > self.temp_curve[itemp] + self.deadband / 2.0 and
-                             self.thermostat_mode == 'Heating')):
+                    if sign * x0 < turn_off:
                         hvac_on_tmp = False
                 else:
-                    AxB = AEx + self.B_ETP_OFF
-                    AIB = np.dot(self.AEI, self.B_ETP_OFF)
-                    AExB = np.dot(AIET, AxB)
-                    x = AExB - AIB
+                    x0, x1 = e00 * x0 + e01 * x1 + c0_off, e10 * x0 + e11 * x1 + c1_off
                     # if self.thermostat_mode == "Cooling":
                     #     # self.temp_curve[0] = self.air_temp - self.deadband / 2.0
                     #     self.temp_curve[itime] = x[0][0] - self.deadband/2.0
@@ -1531,10 +1647,7 @@ class HVACDSOT:  # TODO: update class name
                     #     self.temp_curve[itime] = x[0][0] + self.deadband / 2.0
                     # self.quantity_curve[itime] = last_T_on * self.hvac_kw / T
                     # last_T_off = time[itime]
-                    if ((x[0][0] > self.temp_curve[itemp] + self.deadband / 2.0 and
-                         self.thermostat_mode == 'Cooling') or
-                            (x[0][0] < self.temp_curve[itemp] - self.deadband / 2.0 and
-                             self.thermostat_mode == 'Heating')):
+                    if sign * x0 > turn_on:
                         hvac_on_tmp = True
                 # self.temp_curve[itime] = x[0][0]
                 # if self.thermostat_mode == "Cooling":
@@ -1590,7 +1703,10 @@ class HVACDSOT:  # TODO: update class name
         Q_min = min(self.quantity_curve)
         Q_max = max(self.quantity_curve)
 
-        delta_DA_price = max(self.price_forecast) - min(self.price_forecast)
+        price_max = max(self.price_forecast)
+        price_min = min(self.price_forecast)
+        delta_DA_price = price_max - price_min
+        margin = (self.ProfitMargin_intercept / 100) * delta_DA_price
         # if self.slider!=0:
         #     self.ProfitMargin_slope = delta_DA_price/(Q_min-Q_max)/self.slider # 0  # hvac_dict['ProfitMargin_slope']
         # else:
@@ -1614,30 +1730,30 @@ class HVACDSOT:  # TODO: update class name
                 BID[2][Q] = Qopt_DA
                 BID[3][Q] = Q_max
 
-                BID[0][P] = Q_min * CurveSlope + yIntercept + (self.ProfitMargin_intercept / 100) * delta_DA_price
-                BID[1][P] = Qopt_DA * CurveSlope + yIntercept + (self.ProfitMargin_intercept / 100) * delta_DA_price
-                BID[2][P] = Qopt_DA * CurveSlope + yIntercept - (self.ProfitMargin_intercept / 100) * delta_DA_price
-                BID[3][P] = Q_max * CurveSlope + yIntercept - (self.ProfitMargin_intercept / 100) * delta_DA_price
+                BID[0][P] = Q_min * CurveSlope + yIntercept + margin
+                BID[1][P] = Qopt_DA * CurveSlope + yIntercept + margin
+                BID[2][P] = Qopt_DA * CurveSlope + yIntercept - margin
+                BID[3][P] = Q_max * CurveSlope + yIntercept - margin
             else:
                 BID[0][Q] = Q_min
                 BID[1][Q] = Q_min
                 BID[2][Q] = Q_max
                 BID[3][Q] = Q_max
 
-                BID[0][P] = Q_min * CurveSlope + yIntercept + (self.ProfitMargin_intercept / 100) * delta_DA_price
-                BID[1][P] = Q_min * CurveSlope + yIntercept + (self.ProfitMargin_intercept / 100) * delta_DA_price
-                BID[2][P] = Q_max * CurveSlope + yIntercept - (self.ProfitMargin_intercept / 100) * delta_DA_price
-                BID[3][P] = Q_max * CurveSlope + yIntercept - (self.ProfitMargin_intercept / 100) * delta_DA_price
+                BID[0][P] = Q_min * CurveSlope + yIntercept + margin
+                BID[1][P] = Q_min * CurveSlope + yIntercept + margin
+                BID[2][P] = Q_max * CurveSlope + yIntercept - margin
+                BID[3][P] = Q_max * CurveSlope + yIntercept - margin
         else:
             BID[0][Q] = Q_min
             BID[1][Q] = Q_min
             BID[2][Q] = Q_max
             BID[3][Q] = Q_max
 
-            BID[0][P] = max(self.price_forecast) + (self.ProfitMargin_intercept / 100) * delta_DA_price
-            BID[1][P] = max(self.price_forecast) + (self.ProfitMargin_intercept / 100) * delta_DA_price
-            BID[2][P] = min(self.price_forecast) - (self.ProfitMargin_intercept / 100) * delta_DA_price
-            BID[3][P] = min(self.price_forecast) - (self.ProfitMargin_intercept / 100) * delta_DA_price
+            BID[0][P] = price_max + margin
+            BID[1][P] = price_max + margin
+            BID[2][P] = price_min - margin
+            BID[3][P] = price_min - margin
 
         for i in range(4):
             if BID[i][Q] > self.hvac_kw:
@@ -1660,43 +1776,36 @@ class HVACDSOT:  # TODO: update class name
 
     def get_uncntrl_hvac_load(self, moh, hod, dow):
         self.DA_model_parameters(moh, hod, dow)
-        Quantity = []
-
-        for t in self.TIME:
-            # estimate required quantity for cooling
-            temp_room = self.temp_desired_48hour_cool
-            cop_adj = (-np.array(self.cooling_cop_adj)).tolist()
-            if t == 0:
-                t_pre = self.temp_room_previous_cool
-            else:
-                t_pre = temp_room[t - 1]
-            temp1 = ((temp_room[t] - self.eps * t_pre) / (1 - self.eps)) - self.temperature_forecast[t]
-            temp2 = (temp1 * self.UA - self.internalgain_forecast[t] -
-                     self.solargain_forecast[t] * self.solar_heatgain_factor)
-            quant = temp2 / (cop_adj[t] * 3412.1416331279 / self.latent_factor[t])
-            quant_cool = max(quant, 0)
-
-            # estimate required quantity for heating
-            cop_adj = self.heating_cop_adj
-            temp_room = self.temp_desired_48hour_heat
-            if t == 0:
-                t_pre = self.temp_room_previous_heat
-            else:
-                t_pre = temp_room[t - 1]
-            temp1 = ((temp_room[t] - self.eps * t_pre) / (1 - self.eps)) - self.temperature_forecast[t]
-            temp2 = (temp1 * self.UA - self.internalgain_forecast[t] -
-                     self.solargain_forecast[t] * self.solar_heatgain_factor)
-            quant = temp2 / (cop_adj[t] * 3412.1416331279 / self.latent_factor[t])
-            quant_heat = max(quant, 0)
-
-            # Both quant_cool and quant_heat can not be positive simultaneously.
-            # So whichever is positive, that mode is active
-            quant = max(quant_cool, quant_heat)
-            Quantity.append(abs(quant))
-
-            # Storing the real-time (current hour) temp to be used in next hour initialization
-            self.temp_room_previous_cool = self.temp_desired_48hour_cool[0]
-            self.temp_room_previous_heat = self.temp_desired_48hour_heat[0]
+        n = self.windowLength
+        eps = self.eps
+        UA = self.UA
+        temperature = np.array(self.temperature_forecast[:n])
+        internalgain = np.array(self.internalgain_forecast[:n])
+        solargain = np.array(self.solargain_forecast[:n]) * self.solar_heatgain_factor
+        latent_factor = np.array(self.latent_factor[:n])
+        cooling_cop_adj = np.array(self.cooling_cop_adj[:n])
+        heating_cop_adj = np.array(self.heating_cop_adj[:n])
+        temp_cool = np.array(self.temp_desired_48hour_cool[:n])
+        temp_heat = np.array(self.temp_desired_48hour_heat[:n])
+        # each hour starts from the desired temperature of the hour before
+        t_pre_cool = np.concatenate(([self.temp_room_previous_cool], temp_cool[:-1]))
+        t_pre_heat = np.concatenate(([self.temp_room_previous_heat], temp_heat[:-1]))
+
+        # estimate required quantity for cooling
+        temp1 = ((temp_cool - eps * t_pre_cool) / (1 - eps)) - temperature
+        quant_cool = (temp1 * UA - internalgain - solargain) / (-cooling_cop_adj * 3412.1416331279 / latent_factor)
+
+        # estimate required quantity for heating
+        temp1 = ((temp_heat - eps * t_pre_heat) / (1 - eps)) - temperature
+        quant_heat = (temp1 * UA - internalgain - solargain) / (heating_cop_adj * 3412.1416331279 / latent_factor)
+
+        # Both quant_cool and quant_heat can not be positive simultaneously.
+        # So whichever is positive, that mode is active
+        Quantity = np.abs(np.maximum(np.maximum(quant_cool, 0), np.maximum(quant_heat, 0))).tolist()
+
+        # Storing the real-time (current hour) temp to be used in next hour initialization
+        self.temp_room_previous_cool = self.temp_desired_48hour_cool[0]
+        self.temp_room_previous_heat = self.temp_desired_48hour_heat[0]
 
         return Quantity
 
@@ -1738,21 +1847,21 @@ class HVACDSOT:  # TODO: update class name
             yIntercept.append(-1.0)
 
         delta_DA_price = max(self.price_forecast) - min(self.price_forecast)
+        # the slope and margin are the same for every hour
+        slope = (delta_DA_price / (0 - self.hvac_kw) * (1 + self.ProfitMargin_slope / 100))
+        margin = (self.ProfitMargin_intercept / 100) * delta_DA_price
         for t in self.TIME:
-            CurveSlope[t] = (delta_DA_price / (0 - self.hvac_kw) * (1 + self.ProfitMargin_slope / 100))
+            CurveSlope[t] = slope
             yIntercept[t] = (self.price_forecast[t] - CurveSlope[t] * Quantity[t])
             BID[t][0][Q] = 0
             BID[t][1][Q] = Quantity[t]
             BID[t][2][Q] = Quantity[t]
             BID[t][3][Q] = self.hvac_kw
 
-            BID[t][0][P] = 0 * CurveSlope[t] + yIntercept[t] + (self.ProfitMargin_intercept / 100) * delta_DA_price
-            BID[t][1][P] = Quantity[t] * CurveSlope[t] + yIntercept[t] + (
-                    self.ProfitMargin_intercept / 100) * delta_DA_price
-            BID[t][2][P] = Quantity[t] * CurveSlope[t] + yIntercept[t] - (
-                    self.ProfitMargin_intercept / 100) * delta_DA_price
-            BID[t][3][P] = self.hvac_kw * CurveSlope[t] + yIntercept[t] - (
-                    self.ProfitMargin_intercept / 100) * delta_DA_price
+            BID[t][0][P] = 0 * CurveSlope[t] + yIntercept[t] + margin
+            BID[t][1][P] = Quantity[t] * CurveSlope[t] + yIntercept[t] + margin
+            BID[t][2][P] = Quantity[t] * CurveSlope[t] + yIntercept[t] - margin
+            BID[t][3][P] = self.hvac_kw * CurveSlope[t] + yIntercept[t] - margin
 
             for i in range(4):
                 if BID[t][i][Q] > self.hvac_kw:
@@ -1770,44 +1879,16 @@ class HVACDSOT:  # TODO: update class name
         return self.bid_da
 
     def get_scheduled_setpt(self, moh3, hod4, dow3):
-        """
+        """ Returns the scheduled cooling and heating setpoints for a run of hours
+
         Args:
             moh3: (int): the minute of the hour from 0 to 59
-            hod4: (int): the hour of the day, from 0 to 23
+            hod4: (np.ndarray): the hours of the day, counted on from midnight of dow3 up to 72
             dow3: (int): the day of the week, zero being Monday
+        Returns:
+            (np.ndarray, np.ndarray): cooling and heating setpoints, one per hour
         """
-
-        if 23 < hod4 < 48:
-            hod5 = hod4 - 24
-            dow4 = dow3 + 1
-        elif hod4 > 47:
-            hod5 = hod4 - 48
-            dow4 = dow3 + 2
-        else:
-            hod5 = hod4
-            dow4 = dow3
-        if dow4 > 6:
-            dow4 = dow4 - 7
-        # print(itime,hod4)
-        if dow4 > 4:  # a weekend
-            val_cool = self.weekend_night_set_cool
-            val_heat = self.weekend_night_set_heat
-            if self.weekend_day_start <= hod5 < self.weekend_night_start:
-                val_cool = self.weekend_day_set_cool
-                val_heat = self.weekend_day_set_heat
-        else:  # a weekday
-            val_cool = self.night_set_cool
-            val_heat = self.night_set_heat
-            if self.wakeup_start <= hod5 < self.daylight_start:
-                val_cool = self.wakeup_set_cool
-                val_heat = self.wakeup_set_heat
-            elif self.daylight_start <= hod5 < self.evening_start:
-                val_cool = self.daylight_set_cool
-                val_heat = self.daylight_set_heat
-            elif self.evening_start <= hod5 < self.night_start:
-                val_cool = self.evening_set_cool
-                val_heat = self.evening_set_heat
-        return val_cool, val_heat
+        return scheduled_setpoints(*self.get_schedule(), hod4, dow3)
 
     def DA_model_parameters(self, moh3, hod3, dow3):
         """
@@ -1831,52 +1912,34 @@ class HVACDSOT:  # TODO: update class name
         self.temp_delta = self.temp_max_48hour - self.temp_min_48hour
         # self.price_forecast_0 = self.price_forecast[0] # to be used in RT clearing
 
-        for itime in range(self.windowLength):
-            hod4 = hod3 + moh3 / 60 + itime + 1 / 60  # to take into account the 60 sec shift
-            val_cool, val_heat = self.get_scheduled_setpt(moh3, hod4, dow3)
-            # update temp limits
-            self.update_temp_limits_da(val_cool, val_heat)
-
-            # making sure the desired temperature falls between min and max temp values
-            # these values are used to adjust the basepoint and vice-versa
-            if val_cool > self.temp_max_cool_da:
-                val_cool = self.temp_max_cool_da
-            if val_cool < self.temp_min_cool_da:
-                val_cool = self.temp_min_cool_da
-            if val_heat > self.temp_max_heat_da:
-                val_heat = self.temp_max_heat_da
-            if val_heat < self.temp_min_heat_da:
-                val_heat = self.temp_min_heat_da
-            self.temp_desired_48hour_cool[itime] = val_cool
-            self.temp_desired_48hour_heat[itime] = val_heat
+        hod4 = hod3 + moh3 / 60 + np.arange(self.windowLength) + 1 / 60  # to take into account the 60 sec shift
+        sch_cool, sch_heat = self.get_scheduled_setpt(moh3, hod4, dow3)
+        # update temp limits
+        self.update_temp_limits_da(sch_cool, sch_heat)
 
-        voltage_adj = 1  # voltage adjustment factor due to voltage dependent ZIP load
+        # making sure the desired temperature falls between min and max temp values
+        # these values are used to adjust the basepoint and vice-versa
+        val_cool = np.maximum(np.minimum(sch_cool, self.temp_max_cool_da), self.temp_min_cool_da)
+        val_heat = np.maximum(np.minimum(sch_heat, self.temp_max_heat_da), self.temp_min_heat_da)
+        self.temp_desired_48hour_cool = val_cool.tolist()
+        self.temp_desired_48hour_heat = val_heat.tolist()
 
-        for t in range(self.windowLength):
-            self.latent_factor[t] = ((1 + 0.1 + self.latent_load_fraction / (
-                    1 + math.exp(4 - 10 * self.humidity_forecast[t]))) * voltage_adj)
+        voltage_adj = 1  # voltage adjustment factor due to voltage dependent ZIP load
 
-            # update cooling_cop_adj
-            # use adjusted COP for each step
-            if self.temperature_forecast[t] < self.cooling_COP_limit:
-                self.cooling_cop_adj[t] = self.cooling_COP / (
-                        self.cooling_COP_K0 + self.cooling_COP_K1 * self.cooling_COP_limit)
-            else:
-                self.cooling_cop_adj[t] = self.cooling_COP / (
-                        self.cooling_COP_K0 + self.cooling_COP_K1 * self.temperature_forecast[t])
-
-            # update heating_cop_adj
-            # use adjusted COP for each step
-            if self.temperature_forecast[t] < self.heating_COP_limit:
-                self.heating_cop_adj[t] = self.heating_COP / (
-                        self.heating_COP_K0 + self.heating_COP_K1 * self.heating_COP_limit +
-                        self.heating_COP_K2 * self.heating_COP_limit ** 2 +
-                        self.heating_COP_K3 * self.heating_COP_limit ** 3)
-            else:
-                self.heating_cop_adj[t] = self.heating_COP / (
-                        self.heating_COP_K0 + self.heating_COP_K1 * self.temperature_forecast[t] +
-                        self.heating_COP_K2 * self.temperature_forecast[t] ** 2 +
-                        self.heating_COP_K3 * self.temperature_forecast[t] ** 3)
+        humidity = np.array(self.humidity_forecast[:self.windowLength])
+        self.latent_factor = ((1 + 0.1 + self.latent_load_fraction / (1 + np.exp(4 - 10 * humidity)))
+                              * voltage_adj).tolist()
+
+        # update cooling_cop_adj and heating_cop_adj
+        # use adjusted COP for each step, holding the outdoor temperature at the COP limits from below
+        temperature = np.array(self.temperature_forecast[:self.windowLength])
+        temp_cool = np.maximum(temperature, self.cooling_COP_limit)
+        self.cooling_cop_adj = (self.cooling_COP / (self.cooling_COP_K0 + self.cooling_COP_K1 * temp_cool)).tolist()
+        temp_heat = np.maximum(temperature, self.heating_COP_limit)
+        self.heating_cop_adj = (self.heating_COP / (
+                self.heating_COP_K0 + self.heating_COP_K1 * temp_heat +
+                self.heating_COP_K2 * temp_heat ** 2 +
+                self.heating_COP_K3 * temp_heat ** 3)).tolist()
 
         # temp_room_init = self.air_temp
         self.temp_da_prev = self.temp_room[0]
@@ -1905,45 +1968,42 @@ class HVACDSOT:  # TODO: update class name
         else:
             temp = self.temp_desired_48hour_heat
         if self.hvac_kw != 0 and self.price_delta != 0 and (self.range_low_limit + self.range_high_limit) != 0:
-            return sum(self.slider * (self.price_forecast[t] - np.min(self.price_forecast))
-                       / self.price_delta * m.quan_hvac[t] / self.hvac_kw
-                       + 0.1 * ((m.temp_room[t] - temp[t]) / (self.range_low_limit + self.range_high_limit)) ** 2
-                       + 0.001 * self.slider * (m.quan_hvac[t] / self.hvac_kw * m.quan_hvac[t] / self.hvac_kw)
-                       for t in self.TIME)
+            price_min = min(self.price_forecast)
+            price_weight = self.slider / self.price_delta / self.hvac_kw
+            temp_weight = 0.1 / (self.range_low_limit + self.range_high_limit) ** 2
+            quan_weight = 0.001 * self.slider / self.hvac_kw ** 2
+            return pyo.quicksum(price_weight * (self.price_forecast[t] - price_min) * m.quan_hvac[t]
+                                + temp_weight * (m.temp_room[t] - temp[t]) ** 2
+                                + quan_weight * m.quan_hvac[t] ** 2
+                                for t in self.TIME)
         else:
             return 0
 
-    def con_rule_eq1(self, m, t):  # initialize SOHC state
+    def set_sohc_coefficients(self):
+        """ Collects the constant terms of the room temperature update for each hour of the DA window
+
+        The update is temp_room[t] = eps * temp_room[t-1] + sohc_offset[t] + sohc_gain[t] * quan_hvac[t],
+        so each constraint is built from two numbers instead of the full expression.
+        """
         if self.thermostat_mode == 'Cooling':
-            if t == 0:
-                # Initial SOHC state
-                return m.temp_room[0] == (self.eps * self.temp_room_init + (1 - self.eps) *
-                                          (self.temperature_forecast[0] +
-                                           ((-self.cooling_cop_adj[0] * 0.98 * m.quan_hvac[0] *
-                                             3412.1416331279 / self.latent_factor[0] + self.internalgain_forecast[0] +
-                                             self.solargain_forecast[0] * self.solar_heatgain_factor) / self.UA)))
-            else:
-                # update SOHC
-                return m.temp_room[t] == (self.eps * m.temp_room[t - 1] + (1 - self.eps) *
-                                          (self.temperature_forecast[t] +
-                                           ((-self.cooling_cop_adj[t] * 0.98 * m.quan_hvac[t] *
-                                             3412.1416331279 / self.latent_factor[t] + self.internalgain_forecast[t] +
-                                             self.solargain_forecast[t] * self.solar_heatgain_factor) / self.UA)))
+            cop = [-0.98 * cop_adj for cop_adj in self.cooling_cop_adj]
         else:
-            if t == 0:
-                # Initial SOHC state
-                return m.temp_room[0] == (self.eps * self.temp_room_init + (1 - self.eps) *
-                                          (self.temperature_forecast[0] +
-                                           ((self.heating_cop_adj[0] * 1.02 * m.quan_hvac[0] *
-                                             3412.1416331279 / self.latent_factor[0] + self.internalgain_forecast[0] +
-                                             self.solargain_forecast[0] * self.solar_heatgain_factor) / self.UA)))
-            else:
-                # update SOHC
-                return m.temp_room[t] == (self.eps * m.temp_room[t - 1] + (1 - self.eps) *
-                                          (self.temperature_forecast[t] +
-                                           ((self.heating_cop_adj[t] * 1.02 * m.quan_hvac[t] *
-                                             3412.1416331279 / self.latent_factor[t] + self.internalgain_forecast[t] +
-                                             self.solargain_forecast[t] * self.solar_heatgain_factor) / self.UA)))
+            cop = [1.02 * cop_adj for cop_adj in self.heating_cop_adj]
+        scale = (1 - self.eps) / self.UA
+        self.sohc_gain = [scale * cop[t] * 3412.1416331279 / self.latent_factor[t] for t in self.TIME]
+        self.sohc_offset = [(1 - self.eps) * self.temperature_forecast[t] +
+                            scale * (self.internalgain_forecast[t] +
+                                     self.solargain_forecast[t] * self.solar_heatgain_factor)
+                            for t in self.TIME]
+
+    def con_rule_eq1(self, m, t):  # initialize SOHC state
+        if t == 0:
+            # Initial SOHC state
+            temp_prev = self.temp_room_init
+        else:
+            # update SOHC
+            temp_prev = m.temp_room[t - 1]
+        return m.temp_room[t] == self.eps * temp_prev + self.sohc_offset[t] + self.sohc_gain[t] * m.quan_hvac[t]
 
     def temp_bound_rule(self, m, t):
         if self.thermostat_mode == 'Cooling':
@@ -1953,6 +2013,20 @@ class HVACDSOT:  # TODO: update class name
             return (self.temp_desired_48hour_heat[t] - self.range_low_heat,
                     self.temp_desired_48hour_heat[t] + self.range_high_heat)
 
+    # The DA window moves on by an hour between solves, so the previous solution
+    # shifted by one hour is a close starting point; ipopt picks it up from the NL file.
+    def quan_init_rule(self, m, t):
+        if not self.has_prev_solution:
+            return None
+        prev = self.optimized_Quantity[min(t + 1, self.windowLength - 1)]
+        return min(max(prev, 0.0), self.hvac_kw)
+
+    def temp_init_rule(self, m, t):
+        if not self.has_prev_solution:
+            return None
+        low, high = self.temp_bound_rule(m, t)
+        return min(max(self.temp_room[min(t + 1, self.windowLength - 1)], low), high)
+
     def DA_optimal_quantities(self):
         """ Generates Day Ahead optimized quantities for Water Heater according to the forecasted prices
         and water draw schedule, called by DA_formulate_bid function
@@ -1974,11 +2048,12 @@ class HVACDSOT:  # TODO: update class name
         # Initialize the problem
 
         if nonlinear:
+            self.set_sohc_coefficients()
             # Create model
             model = pyo.ConcreteModel()
             # Decision variables
-            model.quan_hvac = pyo.Var(self.TIME, bounds=(0.0, self.hvac_kw))
-            model.temp_room = pyo.Var(self.TIME, bounds=self.temp_bound_rule)
+            model.quan_hvac = pyo.Var(self.TIME, bounds=(0.0, self.hvac_kw), initialize=self.quan_init_rule)
+            model.temp_room = pyo.Var(self.TIME, bounds=self.temp_bound_rule, initialize=self.temp_init_rule)
             # Objective of the problem
             model.obj = pyo.Objective(rule=self.obj_rule, sense=pyo.minimize)
             # Constraints
@@ -2201,6 +2276,7 @@ def test():
     obj.DA_model_parameters(sim_time.minute, sim_time.hour, sim_time.weekday())
 
     obj.optimized_Quantity, obj.temp_room = obj.DA_optimal_quantities()
+    obj.has_prev_solution = True
 
     # print(obj.temp_desired_48hour_cool)
     for i in range(10):
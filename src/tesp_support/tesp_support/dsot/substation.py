@@ -167,7 +167,8 @@ def inner_substation_loop(metrics_root, with_market):
     retail_unit = 'kW'  # default that will be overwritten by the market definition
 
     # instantiate the forecasting object and map their message input
-    forecast_obj = Forecasting(port, config['markets']['Q_bid_forecast_correction'])  # make object
+    forecast_obj = Forecasting(port, config['markets']['Q_bid_forecast_correction'],
+                               config.get('serverSharedMemory', False))  # make object
     # first, set the simulation year
     forecast_obj.set_sch_year(current_time.year)
     # All schedules are served up through schedule_server.py
@@ -1078,6 +1079,7 @@ def inner_substation_loop(metrics_root, with_market):
                 if p_age.__class__.__name__ == "HVACDSOT":
                     p_age.optimized_Quantity = res[0][:]
                     p_age.temp_room = res[1][:]
+                    p_age.has_prev_solution = True
                 else:
                     p_age.optimized_Quantity = res[:]
                 # formulate the day-ahead bid
@@ -0,0 +1,46 @@
+# Copyright (C) 2021-2024 Battelle Memorial Institute
+# See LICENSE file at https://github.com/pnnl/tesp
+# file: test_helpers_dsot.py
+
+import numpy as np
+
+from tesp_support.dsot.helpers_dsot import curve_bid_sorting
+
+
+def _sort(identity, bid):
+    return curve_bid_sorting(identity, np.array(bid)).tolist()
+
+
+def test_curve_bid_sorting_buyer_monotone():
+    bid = [[5.0, 20.0], [0.0, 30.0], [8.0, 10.0], [2.0, 25.0]]
+    assert _sort('Buyer', bid) == [[0.0, 30.0], [2.0, 25.0], [5.0, 20.0], [8.0, 10.0]]
+
+
+def test_curve_bid_sorting_buyer_tied():
+    # clipped to zero price at the tail
+    bid = [[0.0, 1.0], [3.0, 0.0], [3.09, 0.0]]
+    assert _sort('Buyer', bid) == [[0.0, 1.0], [3.0, 0.0], [3.09, 0.0]]
+    bid = [[4.0, 20.0], [0.0, 30.0], [2.0, 20.0], [6.0, 10.0]]
+    assert _sort('Buyer', bid) == [[0.0, 30.0], [2.0, 20.0], [4.0, 20.0], [6.0, 10.0]]
+    bid = [[0.0, 30.0], [2.0, 20.0], [2.0, 20.0], [8.0, 10.0]]
+    assert _sort('Buyer', bid) == [[0.0, 30.0], [2.0, 20.0], [2.0, 20.0], [8.0, 10.0]]
+
+
+def test_curve_bid_sorting_seller_monotone():
+    bid = [[5.0, 20.0], [0.0, 10.0], [8.0, 30.0], [2.0, 15.0]]
+    assert _sort('Seller', bid) == [[8.0, 30.0], [5.0, 20.0], [2.0, 15.0], [0.0, 10.0]]
+
+
+def test_curve_bid_sorting_seller_tied():
+    bid = [[0.0, 0.0], [2.0, 0.0], [5.0, 20.0], [8.0, 20.0]]
+    assert _sort('Seller', bid) == [[8.0, 20.0], [5.0, 20.0], [2.0, 0.0], [0.0, 0.0]]
+    bid = [[0.0, 10.0], [2.0, 20.0], [2.0, 20.0], [8.0, 30.0]]
+    assert _sort('Seller', bid) == [[8.0, 30.0], [2.0, 20.0], [2.0, 20.0], [0.0, 10.0]]
+
+
+def test_curve_bid_sorting_unordered():
+    # pins the segment ordering of bids that are not monotone in price
+    bid = [[6.4, 2.7], [0.4, 0.2], [8.1, 9.1], [6.1, 7.3]]
+    assert _sort('Buyer', bid) == [[8.1, 9.1], [6.1, 7.3], [0.4, 0.2], [6.4, 2.7]]
+    bid = [[0.5, 3.1], [3.8, 0.5], [1.2, 6.5], [4.3, 7.2]]
+    assert _sort('Seller', bid) == [[4.3, 7.2], [1.2, 6.5], [3.8, 0.5], [0.5, 3.1]]
@@ -0,0 +1,362 @@
+# Copyright (C) 2021-2024 Battelle Memorial Institute
+# See LICENSE file at https://github.com/pnnl/tesp
+# file: test_hvac_agent.py
+
+import math
+from datetime import datetime
+
+import numpy as np
+import pytest
+from scipy import linalg
+
+from tesp_support.dsot.hvac_agent import HVACDSOT, etp_expm, etp_inv, etp_step, schedule_tables, scheduled_setpoints
+
+
+def _etp_matrices():
+    # air/mass state matrices over the range of house parameters, as in calc_etp_model
+    rng = np.random.default_rng(11)
+    for _ in range(200):
+        UA = rng.uniform(100.0, 1000.0)
+        HM = rng.uniform(1000.0, 15000.0)
+        CA = rng.uniform(200.0, 3000.0)
+        CM = rng.uniform(2000.0, 25000.0)
+        yield np.array([[-(UA + HM) / CA, HM / CA], [HM / CM, -HM / CM]])
+
+
+def _near_repeated_matrices():
+    # rotated diagonal matrices with eigenvalues -2 and -2 - eps, down to exactly
+    # repeated, along with the exponential built from the same eigenvectors
+    theta = 0.3
+    Q = np.array([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]])
+    for eps in (1e-1, 1e-3, 1e-4, 1e-5, 1e-6, 1e-7, 1e-9, 0.0):
+        eig = np.array([-2.0, -2.0 - eps])
+
+        def expm(t, eig=eig):
+            return np.dot(Q, np.dot(np.diag(np.exp(eig * t)), Q.T))
+
+        yield np.dot(Q, np.dot(np.diag(eig), Q.T)), expm
+
+
+def _assert_close(actual, expected, rtol):
+    np.testing.assert_allclose(actual, expected, rtol=rtol, atol=rtol * np.abs(expected).max())
+
+
+def test_etp_expm():
+    for A in _etp_matrices():
+        for t in (1.0 / 120.0, 0.01, 0.1, 1.0):
+            _assert_close(etp_expm(A, t), linalg.expm(A * t), 1e-12)
+
+
+def test_etp_expm_near_repeated():
+    # where Sylvester's formula cancels
+    for A, expm in _near_repeated_matrices():
+        for t in (0.01, 1.0):
+            _assert_close(etp_expm(A, t), expm(t), 1e-14)
+            _assert_close(etp_expm(A, t), linalg.expm(A * t), 1e-12)
+
+
+def test_etp_inv():
+    for A in _etp_matrices():
+        _assert_close(etp_inv(A), np.linalg.inv(A), 1e-12)
+    for A, _ in _near_repeated_matrices():
+        _assert_close(etp_inv(A), np.linalg.inv(A), 1e-12)
+    with pytest.raises(np.linalg.LinAlgError):
+        etp_inv(np.array([[1.0, 2.0], [2.0, 4.0]]))
+
+
+def test_etp_step():
+    rng = np.random.default_rng(5)
+    for A in _etp_matrices():
+        AEI = np.linalg.inv(A)
+        B_on = np.array([[rng.uniform(-80.0, 80.0)], [rng.uniform(-5.0, 5.0)]])
+        B_off = np.array([[rng.uniform(-80.0, 80.0)], [rng.uniform(-5.0, 5.0)]])
+        dt = 0.01
+        ((e00, e01), (e10, e11)), c_on, c_off = etp_step(A, AEI, B_on, B_off, dt)
+        AIET = np.dot(AEI, linalg.expm(A * dt))
+        x = np.array([[rng.uniform(60.0, 85.0)], [rng.uniform(60.0, 85.0)]])
+        x0, x1 = x[0, 0], x[1, 0]
+        # the numpy chain the RT loops used to run, switching on and off
+        for step in range(9):
+            B, c = (B_on, c_on) if step % 2 else (B_off, c_off)
+            x = np.dot(AIET, np.dot(A, x) + B) - np.dot(AEI, B)
+            x0, x1 = e00 * x0 + e01 * x1 + c[0], e10 * x0 + e11 * x1 + c[1]
+        _assert_close([x0, x1], x.ravel(), 1e-12)
+
+
+# wakeup, daylight, evening, night, weekend day and weekend night
+_SCHEDULES = [((6.0, 8.0, 17.0, 23.0, 8.0, 23.0),
+               (76.0, 80.0, 75.0, 73.0, 77.0, 74.0),
+               (70.0, 64.0, 70.0, 66.0, 69.0, 65.0)),
+              ((5.5, 7.25, 18.5, 22.75, 9.5, 21.0),
+               (78.5, 84.0, 77.0, 76.5, 79.0, 75.5),
+               (68.0, 62.5, 69.5, 65.0, 67.0, 63.0)),
+              ((0.0, 12.0, 12.0, 24.0, 0.0, 24.0),  # empty evening, day-long windows
+               (74.0, 85.0, 70.0, 72.0, 73.0, 71.0),
+               (71.0, 60.0, 72.0, 67.0, 68.0, 66.0)),
+              ((7.0, 6.0, 20.0, 19.0, 22.0, 7.0),  # windows out of order
+               (77.0, 81.0, 79.0, 74.0, 78.0, 76.0),
+               (66.0, 63.0, 65.0, 64.0, 62.0, 61.0))]
+
+
+def _cascade(starts, set_cool, set_heat, hod4, dow3):
+    # the per-hour setpoint cascade that scheduled_setpoints replaced
+    wakeup_start, daylight_start, evening_start, night_start, weekend_day_start, weekend_night_start = starts
+    if 23 < hod4 < 48:
+        hod5 = hod4 - 24
+        dow4 = dow3 + 1
+    elif hod4 > 47:
+        hod5 = hod4 - 48
+        dow4 = dow3 + 2
+    else:
+        hod5 = hod4
+        dow4 = dow3
+    if dow4 > 6:
+        dow4 = dow4 - 7
+    if dow4 > 4:  # a weekend
+        val_cool, val_heat = set_cool[5], set_heat[5]
+        if weekend_day_start <= hod5 < weekend_night_start:
+            val_cool, val_heat = set_cool[4], set_heat[4]
+    else:  # a weekday
+        val_cool, val_heat = set_cool[3], set_heat[3]
+        if wakeup_start <= hod5 < daylight_start:
+            val_cool, val_heat = set_cool[0], set_heat[0]
+        elif daylight_start <= hod5 < evening_start:
+            val_cool, val_heat = set_cool[1], set_heat[1]
+        elif evening_start <= hod5 < night_start:
+            val_cool, val_heat = set_cool[2], set_heat[2]
+    return val_cool, val_heat
+
+
+def test_scheduled_setpoints():
+    for starts, set_cool, set_heat in _SCHEDULES:
+        for dow3 in range(7):
+            for hod3 in range(24):
+                for moh3 in (0, 30, 59):
+                    # the DA window, as in DA_model_parameters
+                    hod4 = hod3 + moh3 / 60 + np.arange(48) + 1 / 60
+                    val_cool, val_heat = scheduled_setpoints(starts, set_cool, set_heat, hod4, dow3)
+                    expected = [_cascade(starts, set_cool, set_heat, hod, dow3) for hod in hod4.tolist()]
+                    assert val_cool.tolist() == [cool for cool, heat in expected]
+                    assert val_heat.tolist() == [heat for cool, heat in expected]
+
+
+def test_schedule_tables():
+    for starts, set_cool, set_heat in _SCHEDULES:
+        table_cool, table_heat = schedule_tables(starts, set_cool, set_heat)
+        for day in range(7):
+            for hour in range(24):
+                assert (table_cool[day][hour], table_heat[day][hour]) == _cascade(starts, set_cool, set_heat, hour, day)
+
+
+# the house from the hvac_agent test()
+_HOUSE_PROPERTIES = {
+    "feeder_id": "R4_25.00_1", "billingmeter_id": "R4_25_00_1_tn_107_mtr_1", "sqft": 1040.0, "stories": 2,
+    "doors": 4, "thermal_integrity": "VERY_LITTLE", "cooling": "ELECTRIC", "heating": "GAS", "wh_gallons": 0,
+    "house_class": "SINGLE_FAMILY", "Rroof": 20.07, "Rwall": 11.47, "Rfloor": 10.05, "Rdoors": 3.27,
+    "airchange_per_hour": 0.68, "ceiling_height": 9, "thermal_mass_per_floor_area": 2.97, "aspect_ratio": 1.0,
+    "exterior_wall_fraction": 1.0, "exterior_floor_fraction": 1.0, "exterior_ceiling_fraction": 1.0,
+    "window_exterior_transmission_coefficient": 0.57, "glazing_layers": 2, "glass_type": 1, "window_frame": 1,
+    "glazing_treatment": 1, "cooling_COP": 4.0, "over_sizing_factor": 0.2488, "fuel_type": "gas",
+    "zip_skew": -1716.0,
+    "zip_heatgain_fraction": {"constant": 1.0, "responsive_loads": 0.9, "unresponsive_loads": 0.9},
+    "zip_scalar": {"constant": 0.0, "responsive_loads": 0.66, "unresponsive_loads": 0.65},
+    "zip_power_fraction": {"constant": 1.0, "responsive_loads": 1.0, "unresponsive_loads": 0.4},
+    "zip_power_pf": {"constant": 1.0, "responsive_loads": 1.0, "unresponsive_loads": 1.0}}
+
+_PERIODS = ("wakeup", "daylight", "evening", "night", "weekend_day", "weekend_night")
+
+
+def _agent(starts, set_cool, set_heat, slider, seed, house_properties=_HOUSE_PROPERTIES):
+    hvac_dict = {"houseName": "R4_25_00_1_tn_107_hse_1", "meterName": "R4_25_00_1_tn_107_mtr_1",
+                 "houseClass": "SINGLE_FAMILY", "period": 300, "deadband": 2.427,
+                 "ramp_high_limit": 2.0, "ramp_low_limit": 2.0, "range_high_limit": 5.0, "range_low_limit": 3.0,
+                 "slider_setting": slider, "price_cap": 1.0, "bid_delay": 45, "house_participating": True,
+                 "cooling_participating": True, "heating_participating": False}
+    for name, start, cool, heat in zip(_PERIODS, starts, set_cool, set_heat):
+        hvac_dict[name + "_start"] = start
+        hvac_dict[name + "_set_cool"] = cool
+        hvac_dict[name + "_set_heat"] = heat
+    agent = HVACDSOT(hvac_dict, house_properties, 'abc', 11, datetime(2016, 8, 12, 5, 59), 'ipopt')
+    # 48 hours of forecasts, with outdoor temperatures either side of both COP limits
+    rng = np.random.default_rng(seed)
+    agent.temperature_forecast = rng.uniform(20.0, 105.0, 48).tolist()
+    agent.humidity_forecast = rng.uniform(0.0, 1.0, 48).tolist()
+    agent.internalgain_forecast = rng.uniform(0.0, 5000.0, 48).tolist()
+    agent.solargain_forecast = rng.uniform(0.0, 8000.0, 48).tolist()
+    agent.temp_room_previous_cool = rng.uniform(70.0, 80.0)
+    agent.temp_room_previous_heat = rng.uniform(60.0, 72.0)
+    return agent
+
+
+def test_window_frame():
+    starts, set_cool, set_heat = _SCHEDULES[0]
+    for window_frame in range(5):
+        agent = _agent(starts, set_cool, set_heat, 0.3105, 0, dict(_HOUSE_PROPERTIES, window_frame=window_frame))
+        assert agent.window_frame == window_frame
+    for window_frame in (-1, 5):
+        with pytest.raises(ValueError):
+            _agent(starts, set_cool, set_heat, 0.3105, 0, dict(_HOUSE_PROPERTIES, window_frame=window_frame))
+
+
+def _limits_da(agent, cooling_setpt, heating_setpt):
+    # the per-hour update_temp_limits_da
+    temp_max_cool = cooling_setpt + agent.range_high_cool
+    temp_min_cool = cooling_setpt - agent.range_low_cool
+    temp_max_heat = heating_setpt + agent.range_high_heat
+    temp_min_heat = heating_setpt - agent.range_low_heat
+    if temp_max_heat + agent.deadband / 2.0 + 0.5 > temp_min_cool - agent.deadband / 2.0 - 0.5:
+        mid_point = (temp_min_cool + temp_max_heat) / 2.0
+        temp_min_cool = mid_point + agent.deadband / 2.0 + 0.5
+        temp_max_heat = mid_point - agent.deadband / 2.0 - 0.5
+        if temp_min_cool > cooling_setpt:
+            temp_min_cool = cooling_setpt
+        if temp_max_heat < heating_setpt:
+            temp_max_heat = heating_setpt
+    return temp_max_cool, temp_min_cool, temp_max_heat, temp_min_heat
+
+
+def _da_model_parameters(agent, moh3, hod3, dow3):
+    # the per-hour loops that DA_model_parameters replaced
+    starts, set_cool, set_heat = agent.get_schedule()
+    limits = []
+    desired_cool = []
+    desired_heat = []
+    for itime in range(agent.windowLength):
+        hod4 = hod3 + moh3 / 60 + itime + 1 / 60
+        val_cool, val_heat = _cascade(starts, set_cool, set_heat, hod4, dow3)
+        temp_max_cool, temp_min_cool, temp_max_heat, temp_min_heat = _limits_da(agent, val_cool, val_heat)
+        limits.append((temp_max_cool, temp_min_cool, temp_max_heat, temp_min_heat))
+        desired_cool.append(max(min(val_cool, temp_max_cool), temp_min_cool))
+        desired_heat.append(max(min(val_heat, temp_max_heat), temp_min_heat))
+    latent_factor = []
+    cooling_cop_adj = []
+    heating_cop_adj = []
+    for t in range(agent.windowLength):
+        latent_factor.append(1 + 0.1 + agent.latent_load_fraction / (1 + math.exp(4 - 10 * agent.humidity_forecast[t])))
+        temp = max(agent.temperature_forecast[t], agent.cooling_COP_limit)
+        cooling_cop_adj.append(agent.cooling_COP / (agent.cooling_COP_K0 + agent.cooling_COP_K1 * temp))
+        temp = max(agent.temperature_forecast[t], agent.heating_COP_limit)
+        heating_cop_adj.append(agent.heating_COP / (agent.heating_COP_K0 + agent.heating_COP_K1 * temp +
+                                                    agent.heating_COP_K2 * temp ** 2 +
+                                                    agent.heating_COP_K3 * temp ** 3))
+    return limits, desired_cool, desired_heat, latent_factor, cooling_cop_adj, heating_cop_adj
+
+
+def _uncntrl_hvac_load(agent, desired_cool, desired_heat, latent_factor, cooling_cop_adj, heating_cop_adj):
+    # the per-hour loop that get_uncntrl_hvac_load replaced
+    quantity = []
+    for t in range(agent.windowLength):
+        quants = []
+        for temp_room, t_prev, cop_adj in ((desired_cool, agent.temp_room_previous_cool, -cooling_cop_adj[t]),
+                                           (desired_heat, agent.temp_room_previous_heat, heating_cop_adj[t])):
+            t_pre = t_prev if t == 0 else temp_room[t - 1]
+            temp1 = ((temp_room[t] - agent.eps * t_pre) / (1 - agent.eps)) - agent.temperature_forecast[t]
+            temp2 = (temp1 * agent.UA - agent.internalgain_forecast[t] -
+                     agent.solargain_forecast[t] * agent.solar_heatgain_factor)
+            quants.append(max(temp2 / (cop_adj * 3412.1416331279 / latent_factor[t]), 0))
+        quantity.append(abs(max(quants)))
+    return quantity
+
+
+def test_da_model_parameters():
+    for seed, (starts, set_cool, set_heat) in enumerate(_SCHEDULES):
+        for slider in (0.0, 0.3105, 1.0):
+            agent = _agent(starts, set_cool, set_heat, slider, seed)
+            for dow3, hod3, moh3 in ((0, 0, 0), (2, 5, 59), (4, 17, 30), (5, 23, 1), (6, 12, 45)):
+                limits, desired_cool, desired_heat, latent_factor, cooling_cop_adj, heating_cop_adj = \
+                    _da_model_parameters(agent, moh3, hod3, dow3)
+                agent.DA_model_parameters(moh3, hod3, dow3)
+                assert agent.temp_desired_48hour_cool == desired_cool
+                assert agent.temp_desired_48hour_heat == desired_heat
+                _assert_close(agent.latent_factor, latent_factor, 1e-14)
+                _assert_close(agent.cooling_cop_adj, cooling_cop_adj, 1e-14)
+                _assert_close(agent.heating_cop_adj, heating_cop_adj, 1e-14)
+                # the limits for every hour of the window, where the loop kept only the last
+                hod4 = hod3 + moh3 / 60 + np.arange(48) + 1 / 60
+                agent.update_temp_limits_da(*agent.get_scheduled_setpt(moh3, hod4, dow3))
+                for limit, expected in zip((agent.temp_max_cool_da, agent.temp_min_cool_da,
+                                            agent.temp_max_heat_da, agent.temp_min_heat_da), zip(*limits)):
+                    assert np.asarray(limit).tolist() == list(expected)
+
+
+def test_get_uncntrl_hvac_load():
+    for seed, (starts, set_cool, set_heat) in enumerate(_SCHEDULES):
+        for slider in (0.0, 0.3105, 1.0):
+            agent = _agent(starts, set_cool, set_heat, slider, seed)
+            moh3, hod3, dow3 = 59, 5, 4
+            # successive hours, each starting from the desired temperatures the last one stored
+            for hour in range(30):
+                _, desired_cool, desired_heat, latent_factor, cooling_cop_adj, heating_cop_adj = \
+                    _da_model_parameters(agent, moh3, hod3, dow3)
+                expected = _uncntrl_hvac_load(agent, desired_cool, desired_heat, latent_factor,
+                                              cooling_cop_adj, heating_cop_adj)
+                _assert_close(agent.get_uncntrl_hvac_load(moh3, hod3, dow3), expected, 1e-12)
+                assert agent.temp_room_previous_cool == desired_cool[0]
+                assert agent.temp_room_previous_heat == desired_heat[0]
+                hod3 += 1
+                if hod3 > 23:
+                    hod3 = 0
+                    dow3 = (dow3 + 1) % 7
+
+
+def _obj_rule(agent, m):
+    # the objective before it was collected into constant weights
+    if agent.thermostat_mode == 'Cooling':
+        temp = agent.temp_desired_48hour_cool
+    else:
+        temp = agent.temp_desired_48hour_heat
+    return sum(agent.slider * (agent.price_forecast[t] - np.min(agent.price_forecast))
+               / agent.price_delta * m.quan_hvac[t] / agent.hvac_kw
+               + 0.1 * ((m.temp_room[t] - temp[t]) / (agent.range_low_limit + agent.range_high_limit)) ** 2
+               + 0.001 * agent.slider * (m.quan_hvac[t] / agent.hvac_kw * m.quan_hvac[t] / agent.hvac_kw)
+               for t in agent.TIME)
+
+
+def _con_rule_eq1(agent, m, t):
+    # the room temperature update before set_sohc_coefficients
+    if agent.thermostat_mode == 'Cooling':
+        cop = -agent.cooling_cop_adj[t] * 0.98
+    else:
+        cop = agent.heating_cop_adj[t] * 1.02
+    temp_prev = agent.temp_room_init if t == 0 else m.temp_room[t - 1]
+    return m.temp_room[t] == (agent.eps * temp_prev + (1 - agent.eps) *
+                              (agent.temperature_forecast[t] +
+                               ((cop * m.quan_hvac[t] * 3412.1416331279 / agent.latent_factor[t] +
+                                 agent.internalgain_forecast[t] +
+                                 agent.solargain_forecast[t] * agent.solar_heatgain_factor) / agent.UA)))
+
+
+def _residual(pyo, con):
+    # how far the constraint is from holding, whichever side Pyomo moved the constants to
+    return pyo.value(con.body) - pyo.value(con.upper)
+
+
+def test_da_model():
+    pyo = pytest.importorskip('pyomo.environ')
+    starts, set_cool, set_heat = _SCHEDULES[0]
+    rng = np.random.default_rng(3)
+    for mode in ('Cooling', 'Heating'):
+        agent = _agent(starts, set_cool, set_heat, 0.3105, 1)
+        agent.hvac_kw = 4.5
+        agent.set_price_forecast(rng.uniform(0.02, 0.3, 48).tolist())
+        agent.thermostat_mode = mode
+        agent.DA_model_parameters(59, 5, 4)
+        agent.set_sohc_coefficients()
+        # the model DA_optimal_quantities hands to the solver, and the one it used to build
+        model = pyo.ConcreteModel()
+        model.quan_hvac = pyo.Var(agent.TIME, bounds=(0.0, agent.hvac_kw), initialize=agent.quan_init_rule)
+        model.temp_room = pyo.Var(agent.TIME, bounds=agent.temp_bound_rule, initialize=agent.temp_init_rule)
+        model.obj = pyo.Objective(rule=agent.obj_rule, sense=pyo.minimize)
+        model.con1 = pyo.Constraint(agent.TIME, rule=agent.con_rule_eq1)
+        model.obj_base = pyo.Objective(rule=lambda m: _obj_rule(agent, m), sense=pyo.minimize)
+        model.obj_base.deactivate()
+        model.con_base = pyo.Constraint(agent.TIME, rule=lambda m, t: _con_rule_eq1(agent, m, t))
+        for _ in range(5):
+            for t in agent.TIME:
+                low, high = agent.temp_bound_rule(model, t)
+                model.quan_hvac[t].set_value(rng.uniform(0.0, agent.hvac_kw))
+                model.temp_room[t].set_value(rng.uniform(low, high))
+            np.testing.assert_allclose(pyo.value(model.obj), pyo.value(model.obj_base), rtol=1e-12)
+            for t in agent.TIME:
+                np.testing.assert_allclose(_residual(pyo, model.con1[t]), _residual(pyo, model.con_base[t]),
+                                           rtol=1e-9, atol=1e-9)
@@ -0,0 +1,131 @@
+# Copyright (C) 2021-2024 Battelle Memorial Institute
+# See LICENSE file at https://github.com/pnnl/tesp
+# file: test_schedule_client.py
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+def _write_case(case_dir, shared_memory):
+    # two weeks of a minute schedule, an hourly PV forecast for two DSOs and a TOU rate
+    rng = np.random.default_rng(13)
+    index = pd.date_range('2016-01-01', periods=14 * 24 * 60, freq='min')
+    pd.DataFrame({'data': rng.uniform(0.0, 2.0, len(index))}, index=index).to_csv(
+        os.path.join(case_dir, 'responsive_loads.csv'))
+    index = pd.date_range('2016-01-01', periods=14 * 24, freq='h')
+    pv_path = os.path.join(case_dir, 'pv_power.csv')
+    pd.DataFrame({1: rng.uniform(0.0, 50.0, len(index)), 2: rng.uniform(0.0, 50.0, len(index))},
+                 index=index).to_csv(pv_path, header=False)
+    tou_path = os.path.join(case_dir, 'tou.csv')
+    with open(tou_path, 'w') as f:
+        f.write('TOU rates\ntime,DSO_1,DSO_2\n2016-01-01 00:00:00,0.05,0.06\n2016-01-01 07:00:00,0.12,0.14\n')
+    config = {"ScheduleServer": {"schedule_dir": case_dir + os.sep,
+                                 "appliance_sch": ["responsive_loads"],
+                                 "wh_sch": [],
+                                 "comm_sch": [],
+                                 "copy_sch": [["constant", "responsive_loads"]],
+                                 "power_sch": [["pv_power", pv_path]],
+                                 "tou_sch": [["tou", tou_path]],
+                                 "shared_memory": shared_memory}}
+    config_path = os.path.join(case_dir, 'server.json')
+    with open(config_path, 'w') as f:
+        json.dump(config, f)
+    return config_path
+
+
+def _start_server(config_path, port):
+    # as the DSO+T run scripts start it, in a process of its own
+    server = subprocess.Popen([sys.executable, '-c', 'import tesp_support.api.schedule_server as tesp;'
+                               'tesp.schedule_server(%r, %d)' % (config_path, port)])
+    return server
+
+
+def _connect(client_class, port, server, **kwargs):
+    deadline = time.time() + 60
+    while True:
+        try:
+            return client_class(port, **kwargs)
+        except ConnectionRefusedError:
+            if server.poll() is not None or time.time() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def test_shared_schedules():
+    pytest.importorskip('psutil')
+    from tesp_support.api import schedule_client
+    with tempfile.TemporaryDirectory() as case_dir:
+        port = _free_port()
+        server = _start_server(_write_case(case_dir, True), port)
+        try:
+            plain = _connect(schedule_client.DataClient, port, server).proxy
+            shared = _connect(schedule_client.DataClient, port, server, shared=True).proxy
+            assert isinstance(shared, schedule_client.SharedDataProxy)
+            names = [shm.name for shm in shared.shm]
+            assert len(names) == 3  # both running sums and the PV table
+
+            # the forecasts read out of shared memory match what the server sends
+            for when in ('2016-01-01 00:00', '2016-01-03 13:17', '2016-01-11 23:59:30'):
+                t = pd.Timestamp(when)
+                for name in ('responsive_loads', 'constant'):
+                    np.testing.assert_array_equal(shared.forecasting_schedules(name, t, 48),
+                                                  plain.forecasting_schedules(name, t, 48))
+            for when in ('2016-01-01 00:00', '2016-01-05 17:00', '2016-01-14 00:00'):
+                for col_num in (1, 2):
+                    t = pd.Timestamp(when)
+                    assert shared.forecasting_pv_schedules('pv_power', t, 24, col_num) == \
+                        plain.forecasting_pv_schedules('pv_power', t, 24, col_num)
+            with pytest.raises(KeyError):
+                shared.forecasting_pv_schedules('pv_power', pd.Timestamp('2016-01-14 01:00'), 24, 1)
+            assert shared.read_tou_schedules('tou', pd.Timestamp('2016-01-01 07:00'), 1) == 0.14
+
+            # a client detaching leaves the blocks to the server
+            shared.close()
+            again = _connect(schedule_client.DataClient, port, server, shared=True).proxy
+            assert sorted(shm.name for shm in again.shm) == sorted(names)
+            again.close()
+
+            # the server releases the blocks when it is stopped
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+            for name in names:
+                with pytest.raises(FileNotFoundError):
+                    SharedMemory(name=name)
+        finally:
+            if server.poll() is None:
+                server.kill()
+                server.wait()
+
+
+def test_shared_schedules_off():
+    pytest.importorskip('psutil')
+    from tesp_support.api import schedule_client
+    with tempfile.TemporaryDirectory() as case_dir:
+        port = _free_port()
+        server = _start_server(_write_case(case_dir, False), port)
+        try:
+            # without "shared_memory" in the server config the client stays on the proxy
+            client = _connect(schedule_client.DataClient, port, server, shared=True)
+            assert not isinstance(client.proxy, schedule_client.SharedDataProxy)
+            t = pd.Timestamp('2016-01-03 13:17')
+            assert len(client.proxy.forecasting_schedules('responsive_loads', t, 48)) == 48
+        finally:
+            server.kill()
+            server.wait()
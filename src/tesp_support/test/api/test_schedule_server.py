@@ -0,0 +1,106 @@
+# Copyright (C) 2021-2024 Battelle Memorial Institute
+# See LICENSE file at https://github.com/pnnl/tesp
+# file: test_schedule_server.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import tesp_support.api.schedule_server as server
+from tesp_support.api.schedule_server import DataProxy, hourly_forecast, hourly_means, pv_window, running_sum
+
+
+def _minute_schedule():
+    index = pd.date_range('2016-01-01', '2016-12-31 23:59', freq='min')
+    rng = np.random.default_rng(7)
+    return pd.DataFrame({'data': rng.uniform(0.0, 2.0, len(index))}, index=index)
+
+
+def _reference_means(values, start, len_forecast):
+    # hourly means with a plain rolling mean, the year repeated for windows past its end
+    means = pd.Series(np.concatenate((values, values))).rolling(60).mean().to_numpy()
+    return means[start + 59:start + len_forecast * 60:60]
+
+
+def _pv_table():
+    index = pd.date_range('2016-01-01', periods=72, freq='h')
+    return pd.DataFrame({1: np.arange(72.0), 2: np.arange(72.0) * 10}, index=index)
+
+
+def test_pv_window():
+    df = _pv_table()
+    arr = df.to_numpy()
+    time = pd.Timestamp('2016-01-02 05:00')
+    window = pv_window(arr, df.index[0], time, 24, 2)
+    expected = df.loc[pd.date_range(time, periods=24, freq='h')][2].to_numpy()
+    np.testing.assert_array_equal(window, expected)
+    # the last full window of the table
+    window = pv_window(arr, df.index[0], df.index[-24], 24, 1)
+    np.testing.assert_array_equal(window, df[1].to_numpy()[-24:])
+
+
+def test_pv_window_out_of_table():
+    df = _pv_table()
+    arr = df.to_numpy()
+    with pytest.raises(KeyError):
+        pv_window(arr, df.index[0], pd.Timestamp('2015-12-31 23:00'), 24, 1)
+    with pytest.raises(KeyError):
+        pv_window(arr, df.index[0], df.index[-23], 24, 1)
+    with pytest.raises(KeyError):
+        pv_window(arr, df.index[0], pd.Timestamp('2016-01-01 05:30'), 24, 1)
+
+
+def test_read_tou_schedules():
+    index = pd.to_datetime(['2016-01-01 00:00', '2016-01-01 07:00', '2016-01-01 19:00'])
+    prices = np.array([[0.05, 0.06], [0.12, 0.14], [0.08, 0.09]])
+    server.sch_tou_dict['tou_test'] = (index.to_numpy(dtype='datetime64[ns]').view(np.int64), prices)
+    try:
+        # exact match
+        assert DataProxy.read_tou_schedules('tou_test', pd.Timestamp('2016-01-01 07:00'), 1) == 0.14
+        assert DataProxy.read_tou_schedules('tou_test', pd.Timestamp('2016-01-01 00:00'), 0) == 0.05
+        assert DataProxy.read_tou_schedules('tou_test', pd.Timestamp('2016-01-01 19:00'), 1) == 0.09
+        # times that are not in the schedule, as with a lookup by label
+        for time in ('2015-12-31 23:00', '2016-01-01 12:30', '2016-01-02 03:00'):
+            with pytest.raises(KeyError):
+                DataProxy.read_tou_schedules('tou_test', pd.Timestamp(time), 0)
+        # a tz-aware time is not matched against the naive schedule times
+        with pytest.raises(KeyError):
+            DataProxy.read_tou_schedules('tou_test', pd.Timestamp('2016-01-01 07:00', tz='UTC'), 0)
+    finally:
+        del server.sch_tou_dict['tou_test']
+
+
+def test_hourly_means():
+    df = _minute_schedule()
+    values = df['data'].to_numpy()
+    csum = running_sum(df['data'])
+    t0 = df.index[0]
+    n = len(values)
+    cases = [(pd.Timestamp('2016-01-01 00:00'), 0),  # first hour of the year
+             (pd.Timestamp('2016-06-15 13:17'), df.index.get_loc(pd.Timestamp('2016-06-15 13:17'))),
+             (pd.Timestamp('2017-03-01 05:42:30'), df.index.get_loc(pd.Timestamp('2016-03-01 05:42'))),
+             (pd.Timestamp('2016-12-31 00:00'), n - 24 * 60),  # a day window ends on the last minute
+             (pd.Timestamp('2016-12-31 23:00'), n - 60),  # last hour of the year, wraps
+             (pd.Timestamp('2016-12-31 10:59'), n - 13 * 60 - 1)]  # wraps off the hour
+    for time, start in cases:
+        for len_forecast in (1, 24, 48):
+            np.testing.assert_allclose(hourly_means(csum, t0, time, len_forecast),
+                                       _reference_means(values, start, len_forecast), rtol=1e-9)
+
+
+def test_hourly_forecast():
+    df = _minute_schedule()
+    server.sch_csum_dict['sch_test'] = running_sum(df['data'])
+    server.sch_t0_dict['sch_test'] = df.index[0]
+    try:
+        time = pd.Timestamp('2016-12-31 20:00')
+        means = hourly_forecast('sch_test', time, 48)
+        np.testing.assert_allclose(means, _reference_means(df['data'].to_numpy(), len(df) - 4 * 60, 48),
+                                   rtol=1e-9)
+        # the cached result is shared between callers
+        assert not means.flags.writeable
+        assert hourly_forecast('sch_test', time, 48) is means
+    finally:
+        hourly_forecast.cache_clear()
+        del server.sch_csum_dict['sch_test']
+        del server.sch_t0_dict['sch_test']